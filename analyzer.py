@@ -1,10 +1,48 @@
 import requests
-import textrazor
-from google.cloud import language_v1
+from bs4 import BeautifulSoup
 
+import singleflight
 
 
 
+def load_text_from_url(url):
+    """ Loads text from a URL
+
+    Concurrent loads of the same URL share one request.
+
+    Args:
+        url (str): The URL to load text from
+
+    Returns:
+        text (str): The text loaded from the URL
+    """
+    return singleflight.pages.do(url, _load_text_from_url, url)
+
+
+def _load_text_from_url(url):
+    timeout = 20
+
+    results = []
+
+    try:
+            
+        headers = {'User-Agent': 'My User Agent 1.0'}
+        # print("Extracting text from: {}".format(url))
+        response = requests.get(url, headers=headers, timeout=timeout)
+
+        text = response.text
+        status = response.status_code
+
+        if status == 200 and len(text) > 0:
+            return text
+            
+        return None
+    except Exception as e:
+        print(e)
+        print('Problem with url: {0}.'.format(url))
+        return None
+
+
 class TextRazorAnalyzer:
     def __init__(self, api_key):
         """ Initializes TextRazorAnalyzer
@@ -12,7 +50,10 @@ class TextRazorAnalyzer:
         Args:
             api_key (str): The API key for TextRazor
         """
+        import textrazor
+
         textrazor.api_key = api_key
+        self.key_hash = singleflight.content_hash(api_key or "")
         self.client = textrazor.TextRazor(
             extractors=["entities", "topics"],
         )
@@ -22,6 +63,8 @@ class TextRazorAnalyzer:
     def analyze(self, text, is_url):
         """ Analyzes text with TextRazor
 
+        Concurrent analyses of the same text with the same key share one call.
+
         Args:
             text (str): The text to analyze
             is_url (bool): Whether the text is a URL
@@ -29,6 +72,10 @@ class TextRazorAnalyzer:
         Returns:
             response (TextRazorResponse): The response from TextRazor
         """
+        key = ("TextRazor", self.key_hash, singleflight.content_hash(text), is_url)
+        return singleflight.analyses.do(key, self._analyze, text, is_url)
+
+    def _analyze(self, text, is_url):
         if is_url:
             response = self.client.analyze_url(text)
         else:
@@ -36,6 +83,100 @@ class TextRazorAnalyzer:
         return response
 
 
+class SpacyEntity:
+    def __init__(self, name, label, salience, count):
+        """ A named entity found by SpacyAnalyzer
+
+        Args:
+            name (str): The entity text
+            label (str): The spaCy entity label
+            salience (float): The approximated salience, between 0 and 1
+            count (int): The number of mentions
+        """
+        self.name = name
+        self.label = label
+        self.salience = salience
+        self.count = count
+
+
+class SpacyResponse:
+    def __init__(self, entities, language, cleaned_text):
+        """ The result of a SpacyAnalyzer analysis
+
+        Args:
+            entities (list): The SpacyEntity list, by decreasing salience
+            language (str): The language of the text (eng, ita)
+            cleaned_text (str): The analyzed plain text
+        """
+        self.entities = entities
+        self.language = language
+        self.cleaned_text = cleaned_text
+
+
+class SpacyAnalyzer:
+    def __init__(self, lang="eng"):
+        """ Initializes SpacyAnalyzer, which runs NER locally without any API
+
+        Args:
+            lang (str): The language of the texts (eng, ita)
+        """
+        self.lang = lang
+
+    def analyze(self, text, is_url):
+        """ Analyzes text with the local spaCy model
+
+        Salience is approximated from the mentions: every mention weighs
+        between 1 (start of the text) and 0.5 (end of the text), and the
+        weights are normalized so that they sum to 1, like Google NLP's.
+        Concurrent analyses of the same text share one call.
+
+        Args:
+            text (str): The text to analyze
+            is_url (bool): Whether the text is a URL
+
+        Returns:
+            response (SpacyResponse): The entities found in the text
+        """
+        key = ("spaCy", self.lang, singleflight.content_hash(text), is_url)
+        return singleflight.analyses.do(key, self._analyze, text, is_url)
+
+    def _analyze(self, text, is_url):
+        # crawler imports this module
+        import crawler
+        import pos
+
+        if is_url:
+            html = load_text_from_url(text)
+            if not html:
+                return None
+            text = crawler.page_text(BeautifulSoup(html, "lxml"))
+        nlp = pos.load_model(self.lang)
+        chunks = pos.chunk_text(text)
+        length = max(sum(len(chunk) + 1 for chunk in chunks), 1)
+        offset = 0
+        weights = {}
+        labels = {}
+        counts = {}
+        for doc in nlp.pipe(chunks, disable=pos.NER_DISABLED_COMPONENTS):
+            for ent in doc.ents:
+                name = ent.text.strip()
+                if not name:
+                    continue
+                key = name.lower()
+                position = (offset + ent.start_char) / length
+                weights[key] = weights.get(key, 0) + 1 - 0.5 * position
+                counts[key] = counts.get(key, 0) + 1
+                if key not in labels:
+                    labels[key] = (name, ent.label_)
+            offset += len(doc.text) + 1
+        total = sum(weights.values()) or 1
+        entities = [
+            SpacyEntity(labels[key][0], labels[key][1], weight / total, counts[key])
+            for key, weight in sorted(weights.items(), key=lambda x: -x[1])
+        ]
+        return SpacyResponse(entities, self.lang, text)
+
+
 class GoogleNLPAnalyzer:
     def __init__(self, key):
         """ Initializes GoogleNLPAnalyzer
@@ -43,11 +184,16 @@ class GoogleNLPAnalyzer:
         Args:
             key (str): The API key for GoogleNLP
         """
+        from google.cloud import language_v1
+
+        self.key_hash = singleflight.content_hash(key or "")
         self.client = language_v1.LanguageServiceClient.from_service_account_info(key)
 
     def analyze(self, text, is_url):
         """ Analyzes text with GoogleNLP
 
+        Concurrent analyses of the same text with the same key share one call.
+
         Args:
             text (str): The text to analyze
             is_url (bool): Whether the text is a URL
@@ -55,6 +201,12 @@ class GoogleNLPAnalyzer:
         Returns:
             response (GoogleNLPResponse): The response from GoogleNLP
         """
+        key = ("Google NLP", self.key_hash, singleflight.content_hash(text), is_url)
+        return singleflight.analyses.do(key, self._analyze, text, is_url)
+
+    def _analyze(self, text, is_url):
+        from google.cloud import language_v1
+
         if is_url:
             html = self.load_text_from_url(text)
             if not html:
@@ -72,8 +224,11 @@ class GoogleNLPAnalyzer:
                 type_=language_v1.Document.Type.PLAIN_TEXT
             )
 
+            # UTF32 offsets are Python string indexes, used to map mentions
+            # back to paragraphs in incremental mode.
             response = self.client.analyze_entities(
-                document=document
+                document=document,
+                encoding_type=language_v1.EncodingType.UTF32
             )
         return response
     
@@ -87,24 +242,4 @@ class GoogleNLPAnalyzer:
         Returns:
             text (str): The text loaded from the URL
         """
-        timeout = 20
-
-        results = []
-
-        try:
-            
-            headers = {'User-Agent': 'My User Agent 1.0'}
-            # print("Extracting text from: {}".format(url))
-            response = requests.get(url, headers=headers, timeout=timeout)
-
-            text = response.text
-            status = response.status_code
-
-            if status == 200 and len(text) > 0:
-                return text
-            
-            return None
-        except Exception as e:
-            print(e)
-            print('Problem with url: {0}.'.format(url))
-            return None
+        return load_text_from_url(url)
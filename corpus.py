@@ -0,0 +1,344 @@
+"""Sparse entity x document matrix for corpus-scale topical gap analysis.
+
+Entity tables of many documents (yours and your SERP competitors') are
+collected into one sparse matrix, stored as COO arrays: the entity index, the
+document index and the entity weight of every non-zero cell. Entities are
+keyed by Wikidata id, Knowledge Graph id or, failing that, by name, so the
+same entity spelled differently still lines up. TextRazor rows carry Wikidata
+ids and Google NLP rows Knowledge Graph mids: they only line up when a local
+index (wiki_index.py) maps the mids to Wikidata ids. Every query is a
+vectorized numpy operation over the non-zero cells, so the corpus stays
+interactive at 10k+ documents without dense pivots.
+
+    python corpus.py build crawl.jsonl --out corpus.npz --wiki-index wiki-en.idx
+    python corpus.py gaps corpus.npz --mine https://example.com/
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+
+def entity_key(row, index=None):
+    """Get the corpus key of an entity row.
+
+    Args:
+        row (dict): an entity row as built by get_df_text_razor/get_df_google_nlp.
+        index (WikiIndex): a local index mapping Knowledge Graph mids to
+            Wikidata ids, if any.
+
+    Returns:
+        str: the Wikidata id, the Knowledge Graph id or the lowercased name.
+    """
+    if row.get("Wikidata Id"):
+        return row["Wikidata Id"]
+    if row.get("Knowledge Graph ID"):
+        mid = row["Knowledge Graph ID"].split("kgmid=")[-1]
+        if index is not None:
+            record = index.lookup_mid(mid)
+            if record is not None and record.wikidata_id:
+                return record.wikidata_id
+        return mid
+    return str(row["name"]).lower()
+
+
+def entity_weight(row):
+    """Get the weight of an entity row in its document.
+
+    Args:
+        row (dict): an entity row.
+
+    Returns:
+        float: the relevance or salience between 0 and 1, 1 if unknown.
+    """
+    for column in ("Relevance Score", "Salience"):
+        value = row.get(column)
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            return float(value.strip("%")) / 100
+        return float(value)
+    return 1.0
+
+
+class Corpus:
+    def __init__(self, index=None):
+        """ Initializes an empty corpus
+
+        Args:
+            index (WikiIndex): The local index used to key Google NLP
+                entities by Wikidata id, see entity_key
+        """
+        self.index = index
+        self.entities = []
+        self.names = []
+        self.documents = []
+        self._entity_index = {}
+        self._document_index = {}
+        self._rows = []
+        self._cols = []
+        self._values = []
+        self._compiled = None
+
+    def add_document(self, document_id, rows):
+        """ Adds (or replaces) the entity table of a document
+
+        Args:
+            document_id (str): The document id, usually its URL
+            rows (list): The entity rows of the document
+        """
+        if document_id in self._document_index:
+            self.remove_document(document_id)
+        col = len(self.documents)
+        self._document_index[document_id] = col
+        self.documents.append(document_id)
+        weights = {}
+        for row in rows:
+            key = entity_key(row, self.index)
+            if key not in self._entity_index:
+                self._entity_index[key] = len(self.entities)
+                self.entities.append(key)
+                self.names.append(row["name"])
+            i = self._entity_index[key]
+            weights[i] = max(weights.get(i, 0), entity_weight(row))
+        self._rows.extend(weights.keys())
+        self._cols.extend([col] * len(weights))
+        self._values.extend(weights.values())
+        self._compiled = None
+
+    def remove_document(self, document_id):
+        """ Removes a document; its column stays allocated but empty
+
+        Args:
+            document_id (str): The document id
+        """
+        rows, cols, values = self._arrays()
+        keep = cols != self._document_index.pop(document_id)
+        self._rows = rows[keep].tolist()
+        self._cols = cols[keep].tolist()
+        self._values = values[keep].tolist()
+        self._compiled = None
+
+    def _arrays(self):
+        if self._compiled is None:
+            self._compiled = (
+                np.asarray(self._rows, dtype=np.int64),
+                np.asarray(self._cols, dtype=np.int64),
+                np.asarray(self._values, dtype=np.float64),
+            )
+        return self._compiled
+
+    def _columns(self, document_ids):
+        return np.asarray([self._document_index[d] for d in document_ids], dtype=np.int64)
+
+    def _ranked(self, scores, mask, top):
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:top]
+        return [(self.entities[i], self.names[i], float(scores[i])) for i in order]
+
+    @property
+    def n_documents(self):
+        """ The number of documents in the corpus """
+        return len(self._document_index)
+
+    def document_frequency(self):
+        """ Counts the documents each entity appears in
+
+        Returns:
+            numpy.ndarray: The document count, indexed like self.entities
+        """
+        rows, cols, values = self._arrays()
+        return np.bincount(rows, minlength=len(self.entities))
+
+    def tfidf(self):
+        """ Weighs every cell by the inverse document frequency of its entity
+
+        Returns:
+            tuple: The entity indexes, document indexes and TF-IDF values
+        """
+        rows, cols, values = self._arrays()
+        idf = np.log((1 + self.n_documents) / (1 + self.document_frequency())) + 1
+        return rows, cols, values * idf[rows]
+
+    def coverage(self, document_ids=None, top=50):
+        """ Ranks entities by salience-weighted coverage of a set of documents
+
+        Args:
+            document_ids (list): The documents to consider, all if None
+            top (int): The number of entities to return
+
+        Returns:
+            list: (key, name, coverage) tuples, where coverage is the mean
+                weight of the entity over the documents
+        """
+        rows, cols, values = self._arrays()
+        if document_ids is None:
+            selected = np.ones(len(rows), dtype=bool)
+            n = self.n_documents
+        else:
+            selected = np.isin(cols, self._columns(document_ids))
+            n = len(document_ids)
+        scores = np.bincount(rows[selected], weights=values[selected], minlength=len(self.entities)) / max(n, 1)
+        return self._ranked(scores, scores > 0, top)
+
+    def cooccurrence(self, key, top=20):
+        """ Ranks the entities that appear in the same documents as an entity
+
+        Args:
+            key (str): The entity key (Wikidata id, KG id or lowercased name)
+            top (int): The number of entities to return
+
+        Returns:
+            list: (key, name, documents) tuples
+        """
+        rows, cols, values = self._arrays()
+        entity = self._entity_index[key]
+        documents = np.zeros(len(self.documents), dtype=bool)
+        documents[cols[rows == entity]] = True
+        counts = np.bincount(rows[documents[cols]], minlength=len(self.entities))
+        counts[entity] = 0
+        return self._ranked(counts, counts > 0, top)
+
+    def gaps(self, my_document_ids, competitor_document_ids, min_documents=2, top=50):
+        """ Finds the entities competitors cover that my documents lack
+
+        Args:
+            my_document_ids (list): My documents
+            competitor_document_ids (list): The competitor documents
+            min_documents (int): The minimum number of competitor documents
+                an entity must appear in
+            top (int): The number of entities to return
+
+        Returns:
+            list: (key, name, score) tuples, where score is the summed
+                TF-IDF weight of the entity over the competitor documents
+        """
+        rows, cols, values = self.tfidf()
+        n_entities = len(self.entities)
+        mine = np.isin(cols, self._columns(my_document_ids))
+        have = np.bincount(rows[mine], minlength=n_entities) > 0
+        theirs = np.isin(cols, self._columns(competitor_document_ids))
+        counts = np.bincount(rows[theirs], minlength=n_entities)
+        scores = np.bincount(rows[theirs], weights=values[theirs], minlength=n_entities)
+        return self._ranked(scores, (counts >= min_documents) & ~have, top)
+
+    def save(self, path):
+        """ Saves the corpus to a compressed .npz file
+
+        Args:
+            path (str): The file to write
+        """
+        rows, cols, values = self._arrays()
+        live = np.asarray([self._document_index.get(d) == i for i, d in enumerate(self.documents)], dtype=bool)
+        np.savez_compressed(
+            path,
+            rows=rows, cols=cols, values=values,
+            entities=np.asarray(self.entities, dtype=str),
+            names=np.asarray([str(name) for name in self.names], dtype=str),
+            documents=np.asarray(self.documents, dtype=str),
+            live=live,
+        )
+
+    @classmethod
+    def load(cls, path, index=None):
+        """ Loads a corpus saved with save()
+
+        Args:
+            path (str): The .npz file
+            index (WikiIndex): See __init__
+
+        Returns:
+            corpus (Corpus): The loaded corpus
+        """
+        data = np.load(path, allow_pickle=False)
+        corpus = cls(index)
+        corpus.entities = data["entities"].tolist()
+        corpus.names = data["names"].tolist()
+        corpus.documents = data["documents"].tolist()
+        corpus._entity_index = {key: i for i, key in enumerate(corpus.entities)}
+        corpus._document_index = {
+            d: i for i, (d, live) in enumerate(zip(corpus.documents, data["live"])) if live
+        }
+        corpus._rows = data["rows"].tolist()
+        corpus._cols = data["cols"].tolist()
+        corpus._values = data["values"].tolist()
+        return corpus
+
+
+def read_crawl(path):
+    """Read the entity tables of a crawler.py output file.
+
+    Args:
+        path (str): the JSON Lines file.
+
+    Yields:
+        tuple: the URL and the entity rows of each page analyzed without error.
+    """
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if "url" in result and "error" not in result:
+                yield result["url"], result.get("entities", [])
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Entity x document corpus of crawled pages.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="add the pages of crawls to a corpus")
+    build.add_argument("crawls", nargs="+", help="JSON Lines outputs of crawler.py")
+    build.add_argument("--out", required=True, help="corpus .npz, updated if it exists")
+    build.add_argument("--wiki-index", help="local index (wiki_index.py) to key Google NLP entities by Wikidata id")
+    coverage = commands.add_parser("coverage", help="rank the entities covered by the corpus")
+    coverage.add_argument("corpus")
+    coverage.add_argument("--prefix", action="append", help="only the documents starting with this URL prefix")
+    coverage.add_argument("--top", type=int, default=50)
+    gaps = commands.add_parser("gaps", help="rank the entities competitors cover and my documents lack")
+    gaps.add_argument("corpus")
+    gaps.add_argument("--mine", action="append", required=True, help="URL prefix of my documents")
+    gaps.add_argument("--min-documents", type=int, default=2)
+    gaps.add_argument("--top", type=int, default=50)
+    cooccurrence = commands.add_parser("cooccurrence", help="rank the entities found with an entity")
+    cooccurrence.add_argument("corpus")
+    cooccurrence.add_argument("key", help="Wikidata id, Knowledge Graph id or lowercased name")
+    cooccurrence.add_argument("--top", type=int, default=20)
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "build":
+        index = None
+        if args.wiki_index:
+            import wiki_index
+
+            index = wiki_index.WikiIndex(args.wiki_index)
+        corpus = Corpus.load(args.out, index) if os.path.exists(args.out) else Corpus(index)
+        count = 0
+        for path in args.crawls:
+            for url, rows in read_crawl(path):
+                corpus.add_document(url, rows)
+                count += 1
+        corpus.save(args.out)
+        print("Added {0} documents, {1} in the corpus".format(count, corpus.n_documents))
+        return
+
+    corpus = Corpus.load(args.corpus)
+    if args.command == "coverage":
+        document_ids = None
+        if args.prefix:
+            document_ids = [d for d in corpus._document_index if d.startswith(tuple(args.prefix))]
+        ranked = corpus.coverage(document_ids, args.top)
+    elif args.command == "gaps":
+        documents = list(corpus._document_index)
+        mine = [d for d in documents if d.startswith(tuple(args.mine))]
+        theirs = [d for d in documents if not d.startswith(tuple(args.mine))]
+        ranked = corpus.gaps(mine, theirs, args.min_documents, args.top)
+    else:
+        ranked = corpus.cooccurrence(args.key, args.top)
+    for key, name, score in ranked:
+        print("{0:10.3f}  {1:<14} {2}".format(score, key, name))
+
+
+if __name__ == "__main__":
+    main()
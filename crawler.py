@@ -0,0 +1,410 @@
+"""Sitemap-driven site crawler feeding the analysis pipeline.
+
+Page URLs are read lazily from a sitemap.xml (sitemap indexes are followed)
+or discovered from a seed URL on the same host. Pages are fetched by a bounded
+pool of workers, with a politeness delay per host. Each page goes through the
+same tag extraction as write_meta and through the selected analyzer, and every
+result is written to a sink as soon as it completes, so memory stays constant
+whatever the size of the site. The JSON Lines sink doubles as the crawl log:
+re-running the same command skips the pages already in the file.
+
+    python crawler.py --sitemap https://example.com/sitemap.xml \\
+        --provider spacy --lang eng --out example.jsonl
+"""
+import argparse
+import concurrent.futures
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urljoin, urldefrag, urlparse
+
+import requests
+
+from analyzer import TextRazorAnalyzer, GoogleNLPAnalyzer, SpacyAnalyzer
+import markup_audit
+import parallel
+import utils
+
+
+USER_AGENT = "My User Agent 1.0"
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+class HostThrottle:
+    def __init__(self, delay):
+        """ Enforces a minimum delay between two requests to the same host
+
+        Args:
+            delay (float): The delay in seconds
+        """
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url):
+        """ Blocks until the host of url may be requested again
+
+        Args:
+            url (str): The URL about to be requested
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def fetch(url, throttle, timeout=20):
+    """Fetch a URL, respecting the politeness delay of its host.
+
+    Args:
+        url (str): the URL.
+        throttle (HostThrottle): the per-host throttle.
+        timeout (int): the request timeout in seconds.
+
+    Returns:
+        bytes: the response body, or None if the request failed.
+    """
+    throttle.wait(url)
+    try:
+        response = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=timeout)
+    except requests.RequestException as e:
+        print("Problem with url: {0}: {1}".format(url, e))
+        return None
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def iter_sitemap(url, throttle):
+    """Yield the page URLs of a sitemap, following sitemap indexes.
+
+    Args:
+        url (str): the sitemap URL (.xml or .xml.gz).
+        throttle (HostThrottle): the per-host throttle.
+
+    Yields:
+        str: the page URLs.
+    """
+    from lxml import etree
+
+    content = fetch(url, throttle)
+    if not content:
+        return
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    nested = []
+    for event, elem in etree.iterparse(io.BytesIO(content), events=("end",), tag=SITEMAP_NS + "loc", recover=True):
+        loc = (elem.text or "").strip()
+        parent = elem.getparent()
+        if parent is not None and parent.tag == SITEMAP_NS + "sitemap":
+            nested.append(loc)
+        elif loc:
+            yield loc
+        elem.clear()
+    for sitemap in nested:
+        yield from iter_sitemap(sitemap, throttle)
+
+
+def page_text(soup):
+    """Get the visible text of a page.
+
+    Args:
+        soup (BeautifulSoup): the parsed page.
+
+    Returns:
+        str: the whitespace-normalized text, without scripts and styles.
+    """
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    return " ".join(soup.get_text(" ").split())
+
+
+def page_links(url, soup):
+    """Get the same-host links of a page.
+
+    Args:
+        url (str): the page URL.
+        soup (BeautifulSoup): the parsed page.
+
+    Returns:
+        list: the absolute link URLs, without fragments.
+    """
+    host = urlparse(url).netloc
+    links = []
+    for a in soup.find_all("a", href=True):
+        link = urldefrag(urljoin(url, a["href"]))[0]
+        parsed = urlparse(link)
+        if parsed.scheme in ("http", "https") and parsed.netloc == host:
+            links.append(link)
+    return links
+
+
+class JsonlSink:
+    def __init__(self, path):
+        """ Appends one JSON line per crawled page to a file
+
+        Args:
+            path (str): The output file, also used to resume a crawl
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def done_urls(self):
+        """ Reads the URLs already written by a previous run
+
+        Pages that failed are not included, so they are retried.
+
+        Returns:
+            set: The URLs
+        """
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "url" in result and "error" not in result:
+                        done.add(result["url"])
+        return done
+
+    def __call__(self, result):
+        """ Writes a page result
+
+        Args:
+            result (dict): The page result
+        """
+        line = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class Crawler:
+    def __init__(self, provider, key=None, lang="eng", meta_tags_only=False,
+                 scrape_all=False, workers=4, delay=1.0, max_pages=None, processes=False,
+                 audit_markup=False):
+        """ Initializes Crawler
+
+        Args:
+            provider (str): The analyzer (TextRazor, Google NLP, spaCy (offline))
+            key: The TextRazor API key or the Google service account info
+            lang (str): The language of the pages, for the spaCy analyzer
+            meta_tags_only (bool): Whether to analyze only title, description and H1-H3
+            scrape_all (bool): Whether to scrape the Wikipedia descriptions
+            workers (int): The number of pages processed concurrently
+            delay (float): The minimum delay between two requests to a host
+            max_pages (int): The maximum number of pages, None for no limit
+            processes (bool): Whether to parse the pages in the process pool
+                (see parallel.py) instead of on the worker threads
+            audit_markup (bool): Whether to compare the JSON-LD markup of each
+                page with its entities (see markup_audit.py)
+        """
+        self.provider = provider
+        self.key = key
+        self.lang = lang
+        self.meta_tags_only = meta_tags_only
+        self.scrape_all = scrape_all
+        self.workers = workers
+        self.max_pages = max_pages
+        self.processes = processes
+        self.audit_markup = audit_markup
+        self.throttle = HostThrottle(delay)
+        self._local = threading.local()
+
+    def _analyzer(self):
+        if not hasattr(self._local, "analyzer"):
+            if self.provider == "TextRazor":
+                self._local.analyzer = TextRazorAnalyzer(self.key)
+            elif self.provider == "Google NLP":
+                self._local.analyzer = GoogleNLPAnalyzer(self.key)
+            else:
+                self._local.analyzer = SpacyAnalyzer(self.lang)
+        return self._local.analyzer
+
+    def process(self, url, tags, text, blocks=()):
+        """ Analyzes a parsed page
+
+        The page is analyzed as text, so the analyzer does not fetch it again.
+
+        Args:
+            url (str): The page URL
+            tags (tuple): The title, description, H1, H2 and H3 of the page
+            text (str): The visible text of the page
+            blocks (list): The JSON-LD blocks of the page
+
+        Returns:
+            result (dict): url, tags, language and entities of the page, and
+                its topics and IPTC categories with TextRazor (see iptc.py)
+        """
+        title, desc, h1, h2, h3 = tags
+        result = {"url": url, "title": title, "description": desc or "", "h1": h1}
+        if self.meta_tags_only:
+            text = " ".join([m for m in [title, desc, h1, h2, h3] if m])
+        response = self._analyzer().analyze(text, False)
+        if not response:
+            result["error"] = "analysis failed"
+            return result
+        if self.provider == "TextRazor":
+            result["entities"] = utils.text_razor_rows(response, self.scrape_all)
+            result["topics"], result["categories"] = utils.text_razor_topics_categories(response)
+        elif self.provider == "Google NLP":
+            result["entities"] = utils.google_nlp_rows(response, self.scrape_all)
+        else:
+            result["entities"] = utils.spacy_rows(response, self.scrape_all)
+        result["language"] = response.language
+        if self.audit_markup:
+            result["markup"] = markup_audit.audit(blocks, result["entities"])
+        return result
+
+    def _crawl_page(self, url, analyze):
+        html = fetch(url, self.throttle)
+        if html is None:
+            return {"url": url, "error": "fetch failed"}, []
+        try:
+            if self.processes:
+                tags, text, links, blocks = parallel.submit(parallel.parse_page, url, html).result()
+            else:
+                tags, text, links, blocks = parallel.parse_page(url, html)
+        except Exception as e:
+            return {"url": url, "error": "parse failed: " + str(e)}, []
+        if not self._discover:
+            links = []
+        if not analyze:
+            return None, links
+        try:
+            result = self.process(url, tags, text, blocks)
+        except Exception as e:
+            result = {"url": url, "error": str(e)}
+        return result, links
+
+    def run(self, urls, sink, done=(), discover=False):
+        """ Processes pages as they are yielded, with bounded concurrency
+
+        Args:
+            urls (iterable): The page URLs, consumed lazily
+            sink (callable): Called with each page result as it completes
+            done (set): The URLs to skip, from a previous run. When
+                discovering, they are still fetched to follow their links.
+            discover (bool): Whether to queue the same-host links of each page
+
+        Returns:
+            int: The number of pages processed
+        """
+        self._discover = discover
+        done = set(done)
+        seen = set() if discover else set(done)
+        queue = deque()
+        urls = iter(urls)
+        count = 0
+        pending = set()
+
+        def next_url():
+            # Queued links are marked as seen when they are queued
+            if queue:
+                return queue.popleft()
+            while True:
+                url = next(urls, None)
+                if url is None:
+                    return None
+                url = urldefrag(url)[0]
+                if url not in seen:
+                    seen.add(url)
+                    return url
+
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            while True:
+                while len(pending) < self.workers and (self.max_pages is None or count + len(pending) < self.max_pages):
+                    url = next_url()
+                    if url is None:
+                        break
+                    pending.add(executor.submit(self._crawl_page, url, url not in done))
+                if not pending:
+                    break
+                finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    result, links = future.result()
+                    if result is not None:
+                        sink(result)
+                        count += 1
+                    for link in links:
+                        link = urldefrag(link)[0]
+                        if link not in seen:
+                            seen.add(link)
+                            queue.append(link)
+        return count
+
+    def crawl_sitemap(self, sitemap_url, sink, done=()):
+        """ Processes every page of a sitemap
+
+        Args:
+            sitemap_url (str): The sitemap or sitemap index URL
+            sink (callable): Called with each page result as it completes
+            done (set): The URLs to skip, from a previous run
+
+        Returns:
+            int: The number of pages processed
+        """
+        return self.run(iter_sitemap(sitemap_url, self.throttle), sink, done)
+
+    def crawl_seed(self, seed_url, sink, done=()):
+        """ Processes the pages reachable from a seed URL on the same host
+
+        Args:
+            seed_url (str): The first page
+            sink (callable): Called with each page result as it completes
+            done (set): The URLs to skip, from a previous run
+
+        Returns:
+            int: The number of pages processed
+        """
+        return self.run([seed_url], sink, done, discover=True)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Crawl a site and extract the entities of every page.")
+    source = arg_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--sitemap", help="sitemap.xml or sitemap index URL")
+    source.add_argument("--seed", help="seed URL, links on the same host are followed")
+    arg_parser.add_argument("--provider", choices=["textrazor", "google", "spacy"], default="spacy")
+    arg_parser.add_argument("--lang", choices=["eng", "ita"], default="eng", help="language for the spacy provider")
+    arg_parser.add_argument("--out", required=True, help="JSON Lines output, also used to resume")
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument("--delay", type=float, default=1.0, help="seconds between two requests to a host")
+    arg_parser.add_argument("--max-pages", type=int)
+    arg_parser.add_argument("--meta-tags-only", action="store_true")
+    arg_parser.add_argument("--scrape-all", action="store_true")
+    arg_parser.add_argument("--processes", action="store_true", help="parse pages on all cores")
+    arg_parser.add_argument("--audit-markup", action="store_true", help="compare each page's JSON-LD with its entities")
+    args = arg_parser.parse_args(argv)
+
+    provider = {"textrazor": "TextRazor", "google": "Google NLP", "spacy": "spaCy (offline)"}[args.provider]
+    key = None
+    if provider == "TextRazor":
+        key = os.getenv("TEXTRAZOR_TOKEN")
+    elif provider == "Google NLP":
+        key = json.loads(os.getenv("GOOGLE_KEY", "null"))
+    if provider != "spaCy (offline)" and not key:
+        arg_parser.error("set TEXTRAZOR_TOKEN or GOOGLE_KEY to use the {0} provider".format(provider))
+
+    crawler = Crawler(provider, key, args.lang, args.meta_tags_only, args.scrape_all,
+                      args.workers, args.delay, args.max_pages, args.processes, args.audit_markup)
+    sink = JsonlSink(args.out)
+    done = sink.done_urls()
+    if args.sitemap:
+        count = crawler.crawl_sitemap(args.sitemap, sink, done)
+    else:
+        count = crawler.crawl_seed(args.seed, sink, done)
+    print("Processed {0} pages ({1} skipped from a previous run)".format(count, len(done)))
+
+
+if __name__ == "__main__":
+    main()
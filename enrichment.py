@@ -0,0 +1,106 @@
+"""Background Wikipedia enrichment of entity tables.
+
+Scraping the description and the Wikipedia links of every entity takes one
+get_summary_link call per entity. Instead of blocking the entity table on all
+of them, the lookups run on a process-wide thread pool; the table is shown as
+soon as the provider responds and filled in as lookups complete. The task is
+kept in the session, so later reruns pick up whatever is resolved so far.
+"""
+import concurrent.futures
+import os
+import time
+
+import utils
+
+
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("TES_ENRICHMENT_WORKERS", "8")),
+    thread_name_prefix="tes-enrichment",
+)
+
+COLUMNS = ["description", "English Wikipedia Link", "Italian Wikipedia Link"]
+
+
+class EnrichmentTask:
+    def __init__(self, names, lang):
+        """ Starts the Wikipedia lookups of a list of entities
+
+        Args:
+            names (list): The entity names
+            lang (str): The language of the analyzed text
+        """
+        self.lang = lang
+        self.futures = {}
+        for name in names:
+            if name not in self.futures:
+                self.futures[name] = _executor.submit(utils.get_summary_link, name, lang)
+
+    def resolved(self):
+        """ Gets the lookups completed so far
+
+        Returns:
+            dict: name -> (summary, en link, it link)
+        """
+        results = {}
+        for name, future in self.futures.items():
+            if future.done() and not future.exception():
+                results[name] = future.result()
+        return results
+
+    def done(self):
+        """ Whether every lookup has completed """
+        return all(future.done() for future in self.futures.values())
+
+    def progress(self):
+        """ The fraction of lookups completed """
+        if not self.futures:
+            return 1.0
+        return sum(future.done() for future in self.futures.values()) / len(self.futures)
+
+
+def apply(df, task, italian_links=True):
+    """Fill the description and Wikipedia link columns from a task.
+
+    Args:
+        df (DataFrame): the entity table.
+        task (EnrichmentTask): the running or completed lookups.
+        italian_links (bool): Whether to add the Italian Wikipedia Link column
+            (Google NLP and spaCy tables have it, TextRazor's does not).
+
+    Returns:
+        DataFrame: a copy of df with the columns filled for resolved entities.
+    """
+    df = df.copy()
+    if len(df) == 0:
+        return df
+    resolved = task.resolved()
+    columns = COLUMNS if italian_links else COLUMNS[:2]
+    for i, column in enumerate(COLUMNS):
+        if column not in columns:
+            continue
+        values = [(resolved.get(name) or ("", "", ""))[i] or "" for name in df["name"]]
+        if column in df:
+            df[column] = values
+        elif column == "description":
+            df.insert(loc=list(df.columns).index("name") + 1, column=column, value=values)
+        else:
+            df[column] = values
+    return df
+
+
+def follow(placeholder, df, task, italian_links=True, interval=0.5):
+    """Refresh a table placeholder until every lookup has completed.
+
+    Call it at the end of the script, so the rest of the page is not blocked.
+
+    Args:
+        placeholder: the st.empty() slot showing the entity table.
+        df (DataFrame): the entity table.
+        task (EnrichmentTask): the running lookups.
+        italian_links (bool): see apply.
+        interval (float): the refresh interval in seconds.
+    """
+    while not task.done():
+        time.sleep(interval)
+        placeholder.write(apply(df, task, italian_links))
+    placeholder.write(apply(df, task, italian_links))
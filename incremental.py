@@ -0,0 +1,379 @@
+"""Incremental re-analysis of pages that are audited again and again.
+
+The content is split into paragraphs and every paragraph is hashed. The
+entity mentions found in each paragraph are stored on disk, so the next run
+only sends the new or changed paragraphs to the provider, in a single call,
+and maps the mentions back to their paragraph through their offsets. The
+per-paragraph results are then merged into the usual entity table.
+
+Google NLP salience is relative to the text that was sent. The salience of
+an entity in an analyzed batch is split evenly across the batch paragraphs
+that mention it, and each share is stored with the length of its batch. The
+merge weights every share by batch length over document length, so a single
+call for the whole document gives back the provider's values, and later
+partial calls approximate them.
+
+The results of text drafts are tied to a session: they are removed once they
+have not been updated for TES_SESSION_TTL seconds, like the session results.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+import unidecode
+from bs4 import BeautifulSoup
+
+from analyzer import TextRazorAnalyzer, GoogleNLPAnalyzer, load_text_from_url
+import utils
+
+
+STORE_DIR = os.getenv("TES_INCREMENTAL_DIR", ".tes_incremental")
+PARAGRAPH_SEP = "\n\n"
+DRAFT_TTL = float(os.getenv("TES_SESSION_TTL", "86400"))
+# Stored states of another version are ignored and rebuilt
+STATE_VERSION = 2
+
+# Elements that start a new paragraph; inline elements (a, b, span...) do not.
+BLOCK_TAGS = [
+    "p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "td", "th", "blockquote",
+    "pre", "dt", "dd", "figcaption", "caption", "div", "section", "article",
+    "header", "footer", "aside", "nav", "main", "ul", "ol", "table", "tr", "form",
+]
+BLOCK_MARK = "\ue000"
+
+
+def split_paragraphs(text_input, is_url):
+    """Split a page or a text into paragraphs.
+
+    Args:
+        text_input (str): the URL or the text.
+        is_url (bool): If True, text_input is a URL.
+
+    Returns:
+        list: the non-empty paragraphs, whitespace-normalized.
+    """
+    if is_url:
+        html = load_text_from_url(text_input)
+        if not html:
+            return []
+        soup = BeautifulSoup(html, "lxml")
+        for tag in soup(["script", "style", "noscript"]):
+            tag.decompose()
+        for tag in soup(BLOCK_TAGS):
+            tag.insert_before(BLOCK_MARK)
+            tag.append(BLOCK_MARK)
+        blocks = soup.get_text(" ").split(BLOCK_MARK)
+    else:
+        blocks = re.split(r"\n\s*\n", text_input)
+    paragraphs = [" ".join(block.split()) for block in blocks]
+    return [p for p in paragraphs if p]
+
+
+def paragraph_hash(paragraph):
+    """Hash a paragraph.
+
+    Args:
+        paragraph (str): the paragraph.
+
+    Returns:
+        str: the hex digest.
+    """
+    return hashlib.sha1(paragraph.encode("utf-8")).hexdigest()
+
+
+def _state_path(provider, document_id, draft=False):
+    key = hashlib.sha1((provider + "\0" + document_id).encode("utf-8")).hexdigest()
+    return os.path.join(STORE_DIR, ("draft-" if draft else "") + key + ".json")
+
+
+def load_state(provider, document_id, draft=False):
+    """Load the stored per-paragraph results of a previous run.
+
+    Args:
+        provider (str): the provider name (TextRazor, Google NLP).
+        document_id (str): the URL, or the name of a text draft.
+        draft (bool): If True, document_id names a text draft.
+
+    Returns:
+        dict: the state, with language and paragraphs (hash -> mentions).
+    """
+    path = _state_path(provider, document_id, draft)
+    if os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    return {"version": STATE_VERSION, "language": None, "paragraphs": {}}
+
+
+def save_state(provider, document_id, state, draft=False):
+    """Store the per-paragraph results of a run.
+
+    The state is written to a unique temporary file first, so concurrent
+    runs on the same document never interleave their writes.
+
+    Args:
+        provider (str): the provider name (TextRazor, Google NLP).
+        document_id (str): the URL, or the name of a text draft.
+        state (dict): the state to store.
+        draft (bool): If True, document_id names a text draft.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=STORE_DIR)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(dict(state, version=STATE_VERSION), f)
+        os.replace(tmp_path, _state_path(provider, document_id, draft))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def expire_drafts(ttl=DRAFT_TTL):
+    """Remove the stored results of the drafts not updated for ttl seconds.
+
+    Args:
+        ttl (float): the seconds after which a draft state is removed.
+
+    Returns:
+        int: the number of files removed.
+    """
+    if not os.path.isdir(STORE_DIR):
+        return 0
+    limit = time.time() - ttl
+    removed = 0
+    for name in os.listdir(STORE_DIR):
+        if not (name.startswith("draft-") or name.endswith(".tmp")):
+            continue
+        path = os.path.join(STORE_DIR, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            # Removed by a concurrent run
+            continue
+    return removed
+
+
+def _paragraph_at(starts, position):
+    lo, hi = 0, len(starts)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if starts[mid] <= position:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def text_razor_mentions(response, starts):
+    """Group the TextRazor entities of a response by paragraph.
+
+    Args:
+        response (TextRazorResponse): the response for the joined paragraphs.
+        starts (list): the offset of each paragraph in the joined text.
+
+    Returns:
+        list: for each paragraph, the list of mention dicts.
+    """
+    mentions = [[] for _ in starts]
+    for entity in response.entities():
+        if entity.dbpedia_types:
+            entity_type = entity.dbpedia_types[0]
+        elif entity.freebase_types:
+            entity_type = entity.freebase_types[0]
+        else:
+            entity_type = "thing"
+        mentions[_paragraph_at(starts, entity.starting_position)].append({
+            "name": entity.id,
+            "type": entity_type.split("/")[-1],
+            "wikidata": entity.wikidata_id,
+            "link": entity.wikipedia_link,
+            "confidence": entity.confidence_score,
+            "relevance": entity.relevance_score,
+        })
+    return mentions
+
+
+def google_mentions(response, starts, length):
+    """Group the Google NLP entities of a response by paragraph.
+
+    The salience of each entity is split evenly across the paragraphs that
+    mention it; every share keeps the batch length, see merge_google.
+
+    Args:
+        response (AnalyzeEntitiesResponse): the response for the joined paragraphs.
+        starts (list): the offset of each paragraph in the joined text.
+        length (int): the length of the joined text.
+
+    Returns:
+        list: for each paragraph, the list of mention dicts.
+    """
+    mentions = [[] for _ in starts]
+    for entity in response.entities:
+        paragraphs = sorted(set(_paragraph_at(starts, m.text.begin_offset) for m in entity.mentions))
+        for i in paragraphs:
+            mentions[i].append({
+                "name": entity.name,
+                "type": int(entity.type_),
+                "salience": entity.salience / len(paragraphs),
+                "batch": length,
+                "mid": entity.metadata.get("mid", ""),
+            })
+    return mentions
+
+
+def merge_text_razor(paragraph_mentions):
+    """Merge per-paragraph TextRazor mentions into entity rows.
+
+    Args:
+        paragraph_mentions (list): for each paragraph, its mention dicts.
+
+    Returns:
+        list: the rows, shaped like get_df_text_razor's.
+    """
+    entities = {}
+    for mentions in paragraph_mentions:
+        for m in mentions:
+            if m["confidence"] <= 0 or m["relevance"] <= 0:
+                continue
+            known = entities.get(m["name"])
+            if known is None:
+                entities[m["name"]] = dict(m)
+            else:
+                known["confidence"] = max(known["confidence"], m["confidence"])
+                known["relevance"] = max(known["relevance"], m["relevance"])
+    output = []
+    for name, m in entities.items():
+        if str(name).isnumeric() or utils.is_time(name):
+            continue
+        output.append({
+            "DBpedia Category": m["type"],
+            "name": name,
+            "Wikidata Id": m["wikidata"],
+            "Confidence Score": m["confidence"],
+            "Relevance Score": f"{m['relevance'] * 100:.2f}%",
+            "Wikipedia Link": m["link"],
+        })
+    return output
+
+
+def merge_google(paragraph_mentions, length):
+    """Merge per-paragraph Google NLP mentions into entity rows.
+
+    Each salience share is weighted by the length of the batch it was
+    computed on over the length of the document.
+
+    Args:
+        paragraph_mentions (list): for each paragraph, its mention dicts.
+        length (int): the length of the document, paragraphs joined.
+
+    Returns:
+        list: the rows, shaped like get_df_google_nlp's.
+    """
+    length = length or 1
+    entities = {}
+    for mentions in paragraph_mentions:
+        for m in mentions:
+            known = entities.setdefault(m["name"], dict(m, salience=0))
+            known["salience"] += m["salience"] * m["batch"] / length
+    output = []
+    for name, m in sorted(entities.items(), key=lambda x: -x[1]["salience"]):
+        row_type = utils.google_types[m["type"]] if m["type"] else "thing"
+        if row_type in ["NUMBER", "PRICE", "DATE"]:
+            continue
+        if str(name).isnumeric() or utils.is_time(name):
+            continue
+        output.append({
+            "type": row_type,
+            "name": unidecode.unidecode(name),
+            "Salience": f"{m['salience'] * 100:.2f}%",
+            "Knowledge Graph ID": "https://www.google.com/search?kgmid=" + m["mid"] if m["mid"] else "",
+        })
+    return output
+
+
+def analyze(provider, key, text_input, is_url, document_id=None):
+    """Analyze a page or a text, sending only the paragraphs that changed.
+
+    Args:
+        provider (str): the provider name (TextRazor, Google NLP).
+        key: the TextRazor API key or the Google service account info.
+        text_input (str): the URL or the text.
+        is_url (bool): If True, text_input is a URL.
+        document_id (str): the key of the stored results. Defaults to the
+            URL; required for texts, e.g. one draft per session.
+
+    Returns:
+        output (list): the entity rows for the whole document.
+        text (str): the analyzed text, paragraphs joined.
+        language (str): the language of the document.
+        report (dict): what changed since the previous run.
+    """
+    if document_id is None:
+        if not is_url:
+            raise ValueError("a document_id is required to analyze a text incrementally")
+        document_id = text_input
+    draft = not is_url
+    if draft:
+        expire_drafts()
+    paragraphs = split_paragraphs(text_input, is_url)
+    hashes = [paragraph_hash(p) for p in paragraphs]
+    state = load_state(provider, document_id, draft)
+    stored = state["paragraphs"]
+
+    changed = []
+    pending = set()
+    for i, h in enumerate(hashes):
+        if h not in stored and h not in pending:
+            changed.append(i)
+            pending.add(h)
+    language = state["language"]
+    if changed:
+        starts = []
+        offset = 0
+        for i in changed:
+            starts.append(offset)
+            offset += len(paragraphs[i]) + len(PARAGRAPH_SEP)
+        joined = PARAGRAPH_SEP.join(paragraphs[i] for i in changed)
+        if provider == "TextRazor":
+            response = TextRazorAnalyzer(key).analyze(joined, False)
+            mentions = text_razor_mentions(response, starts)
+        else:
+            response = GoogleNLPAnalyzer(key).analyze(joined, False)
+            mentions = google_mentions(response, starts, len(joined))
+        language = response.language
+        for i, paragraph_result in zip(changed, mentions):
+            stored[hashes[i]] = paragraph_result
+
+    previous = set(state.get("order", []))
+    # A repeated paragraph was analyzed once: it is merged once too
+    lengths = dict(zip(hashes, (len(p) for p in paragraphs)))
+    current = [stored[h] for h in lengths]
+    if provider == "TextRazor":
+        output = merge_text_razor(current)
+    else:
+        length = sum(lengths.values()) + len(PARAGRAPH_SEP) * (len(lengths) - 1)
+        output = merge_google(current, length)
+
+    old_names = set(state.get("entities", []))
+    new_names = set(row["name"] for row in output)
+    report = {
+        "paragraphs": len(paragraphs),
+        "analyzed": len(changed),
+        "unchanged": len(paragraphs) - len(changed),
+        "removed": len(previous - set(hashes)),
+        "added_entities": sorted(new_names - old_names) if state.get("order") else [],
+        "removed_entities": sorted(old_names - new_names),
+    }
+    save_state(provider, document_id, {
+        "language": language,
+        "order": hashes,
+        "paragraphs": {h: stored[h] for h in hashes},
+        "entities": sorted(new_names),
+    }, draft)
+    return output, PARAGRAPH_SEP.join(paragraphs), language, report
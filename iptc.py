@@ -0,0 +1,336 @@
+"""IPTC Media Topics hierarchy roll-up of TextRazor categories.
+
+TextRazor's textrazor_mediatopics classifier labels each category with its
+full IPTC path ("sport>competition discipline>football"). The Taxonomy below
+indexes every node of those paths once: a parent array, a depth array and an
+ancestor matrix (one row per node: itself, its parent, its grandparent...,
+padded with -1). The category scores of one document or of a whole batch are
+kept as COO arrays (document index, node index, score) like corpus.py, and a
+roll-up credits every cell to all the ancestors of its node with one fancy
+indexing of the ancestor matrix, then reduces the duplicates of each
+(document, node) pair with a sort. Site-level summaries are a bincount over
+the rolled-up cells: no DataFrame groupby and no string handling per query.
+
+The taxonomy is filled from the category paths it sees, or precomputed from
+the official IPTC Media Topics file (cptall-en-GB.json) and saved to .npz.
+Topics have no IPTC hierarchy: a Taxonomy of topic labels has root nodes only,
+so the same functions aggregate them across documents without a tree.
+"""
+import argparse
+import json
+
+import numpy as np
+
+
+SEPARATOR = ">"
+
+
+def split_path(label):
+    """Split an IPTC category label into the names of its path.
+
+    Args:
+        label (str): the label, e.g. "sport>competition discipline>football".
+
+    Returns:
+        list: the names, from the top level down.
+    """
+    return [part.strip() for part in str(label).split(SEPARATOR) if part.strip()]
+
+
+def category_code(category_id):
+    """Get the IPTC code of a TextRazor category id or an IPTC URI/qcode.
+
+    Args:
+        category_id (str): e.g. "20000523", "mediatopic/20000523" or
+            "medtop:20000523".
+
+    Returns:
+        str: the code, "20000523", or None.
+    """
+    if not category_id:
+        return None
+    return str(category_id).replace(":", "/").rstrip("/").rsplit("/", 1)[-1] or None
+
+
+class Taxonomy:
+    def __init__(self):
+        """ Initializes an empty taxonomy """
+        self.paths = []
+        self.parents = []
+        self.depths = []
+        self._index = {}
+        self._codes = {}
+        self._compiled = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def add_path(self, label, code=None):
+        """ Adds a node and its missing ancestors
+
+        Args:
+            label (str): The full path of the node
+            code (str): The IPTC code of the node, if known
+
+        Returns:
+            int: The node index
+        """
+        parent = -1
+        parts = split_path(label)
+        for depth in range(len(parts)):
+            path = SEPARATOR.join(parts[:depth + 1])
+            node = self._index.get(path)
+            if node is None:
+                node = len(self.paths)
+                self._index[path] = node
+                self.paths.append(path)
+                self.parents.append(parent)
+                self.depths.append(depth)
+                self._compiled = None
+            parent = node
+        if code and parent >= 0:
+            self._codes[code] = parent
+        return parent
+
+    def node(self, row, add=True):
+        """ Finds the node of a category row
+
+        Args:
+            row (dict): A category row, with "path" (or "label") and "id"
+            add (bool): Whether to add the path if it is unknown
+
+        Returns:
+            int: The node index, -1 if unknown and not added
+        """
+        code = category_code(row.get("id"))
+        if code in self._codes:
+            return self._codes[code]
+        path = SEPARATOR.join(split_path(row.get("path") or row["label"]))
+        if path in self._index:
+            return self._index[path]
+        return self.add_path(path, code) if add else -1
+
+    def label(self, node):
+        """ The last name of the path of a node """
+        return self.paths[node].rsplit(SEPARATOR, 1)[-1]
+
+    def _arrays(self):
+        if self._compiled is None:
+            parents = np.asarray(self.parents, dtype=np.int64)
+            depths = np.asarray(self.depths, dtype=np.int64)
+            max_depth = int(depths.max()) if len(depths) else 0
+            ancestors = np.full((len(parents), max_depth + 1), -1, dtype=np.int64)
+            ancestors[:, 0] = np.arange(len(parents))
+            for k in range(1, max_depth + 1):
+                previous = ancestors[:, k - 1]
+                ancestors[:, k] = np.where(previous >= 0, parents[np.maximum(previous, 0)], -1)
+            self._compiled = (parents, depths, ancestors)
+        return self._compiled
+
+    def rollup(self, docs, nodes, scores, how="max"):
+        """ Credits every score to the node and all its ancestors
+
+        Args:
+            docs (numpy.ndarray): The document index of each cell
+            nodes (numpy.ndarray): The node index of each cell
+            scores (numpy.ndarray): The score of each cell
+            how (str): How the scores of a (document, node) pair are
+                combined, "max" (a confidence: the best evidence below the
+                node) or "sum"
+
+        Returns:
+            tuple: The document indexes, node indexes and scores of the
+                rolled-up cells, one per (document, node) pair
+        """
+        parents, depths, ancestors = self._arrays()
+        expanded = ancestors[nodes]
+        valid = expanded >= 0
+        docs = np.broadcast_to(np.asarray(docs, dtype=np.int64)[:, None], expanded.shape)[valid]
+        scores = np.broadcast_to(np.asarray(scores, dtype=np.float64)[:, None], expanded.shape)[valid]
+        nodes = expanded[valid]
+        if not len(nodes):
+            return docs, nodes, scores
+        keys = docs * len(self.paths) + nodes
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        reduce = np.maximum if how == "max" else np.add
+        return docs[order][starts], nodes[order][starts], reduce.reduceat(scores[order], starts)
+
+    def summary(self, docs, nodes, scores, n_docs, depth=None, how="max", top=20):
+        """ Ranks the nodes by mean rolled-up score over documents
+
+        Args:
+            docs, nodes, scores (numpy.ndarray): The COO cells, see rollup
+            n_docs (int): The number of documents
+            depth (int): Only rank the nodes at this depth (0 is the top
+                level), all if None
+            how (str): See rollup
+            top (int): The number of nodes to return
+
+        Returns:
+            list: (path, mean score, document count) tuples
+        """
+        parents, depths, ancestors = self._arrays()
+        docs, nodes, scores = self.rollup(docs, nodes, scores, how)
+        totals = np.bincount(nodes, weights=scores, minlength=len(self.paths)) / max(n_docs, 1)
+        counts = np.bincount(nodes, minlength=len(self.paths))
+        mask = counts > 0
+        if depth is not None:
+            mask &= depths == depth
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.argsort(-totals[candidates], kind="stable")][:top]
+        return [(self.paths[i], float(totals[i]), int(counts[i])) for i in order]
+
+    def save(self, path):
+        """ Saves the taxonomy to a compressed .npz file
+
+        Args:
+            path (str): The file to write
+        """
+        parents, depths, ancestors = self._arrays()
+        codes = sorted(self._codes.items())
+        np.savez_compressed(
+            path,
+            paths=np.asarray(self.paths, dtype=str),
+            parents=parents, depths=depths,
+            codes=np.asarray([c for c, n in codes], dtype=str),
+            code_nodes=np.asarray([n for c, n in codes], dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """ Loads a taxonomy saved with save()
+
+        Args:
+            path (str): The .npz file
+
+        Returns:
+            taxonomy (Taxonomy): The loaded taxonomy
+        """
+        data = np.load(path, allow_pickle=False)
+        taxonomy = cls()
+        taxonomy.paths = data["paths"].tolist()
+        taxonomy.parents = data["parents"].tolist()
+        taxonomy.depths = data["depths"].tolist()
+        taxonomy._index = {p: i for i, p in enumerate(taxonomy.paths)}
+        taxonomy._codes = dict(zip(data["codes"].tolist(), data["code_nodes"].tolist()))
+        return taxonomy
+
+    @classmethod
+    def from_iptc_json(cls, path, lang="en-GB"):
+        """ Builds the taxonomy from the IPTC Media Topics file
+
+        Args:
+            path (str): The cptall JSON file from cv.iptc.org
+            lang (str): The language of the labels
+
+        Returns:
+            taxonomy (Taxonomy): The taxonomy, with every IPTC code
+        """
+        with open(path, encoding="utf-8") as f:
+            concepts = json.load(f)["conceptSet"]
+        labels = {}
+        broader = {}
+        for concept in concepts:
+            code = category_code(concept.get("qcode") or concept.get("uri"))
+            labels[code] = concept.get("prefLabel", {}).get(lang, code).replace(SEPARATOR, " ")
+            parents = [category_code(b) for b in concept.get("broader", [])]
+            broader[code] = parents[0] if parents else None
+
+        def full_path(code):
+            names = []
+            while code in labels and len(names) < len(labels):
+                names.append(labels[code])
+                code = broader[code]
+            return SEPARATOR.join(reversed(names))
+
+        taxonomy = cls()
+        for code in labels:
+            taxonomy.add_path(full_path(code), code)
+        return taxonomy
+
+
+def cells(taxonomy, documents):
+    """Collect the category rows of many documents into COO arrays.
+
+    Args:
+        taxonomy (Taxonomy): the taxonomy, unknown paths are added to it.
+        documents (list): the category row list of each document.
+
+    Returns:
+        tuple: the document indexes, node indexes and scores. Rows without
+            a path (an empty label) are skipped.
+    """
+    docs, nodes, scores = [], [], []
+    for doc, rows in enumerate(documents):
+        for row in rows:
+            node = taxonomy.node(row)
+            if node < 0:
+                continue
+            docs.append(doc)
+            nodes.append(node)
+            scores.append(float(row["score"]))
+    return (np.asarray(docs, dtype=np.int64), np.asarray(nodes, dtype=np.int64),
+            np.asarray(scores, dtype=np.float64))
+
+
+def document_rollup(rows, taxonomy=None, how="max"):
+    """Roll the categories of one document up the IPTC tree.
+
+    Args:
+        rows (list): the category rows of the document.
+        taxonomy (Taxonomy): the taxonomy, a new one if None.
+        how (str): see Taxonomy.rollup.
+
+    Returns:
+        list: {"level", "label", "path", "score"} dicts, by level and
+            decreasing score.
+    """
+    taxonomy = taxonomy or Taxonomy()
+    docs, nodes, scores = taxonomy.rollup(*cells(taxonomy, [rows]), how=how)
+    output = [
+        {"level": taxonomy.depths[n] + 1, "label": taxonomy.label(n), "path": taxonomy.paths[n], "score": float(s)}
+        for n, s in zip(nodes.tolist(), scores.tolist())
+    ]
+    return sorted(output, key=lambda row: (row["level"], -row["score"]))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Summarize the IPTC categories of the pages of a crawl.")
+    arg_parser.add_argument("crawl", help="JSON Lines output of crawler.py (TextRazor provider)")
+    arg_parser.add_argument("--taxonomy", help="taxonomy .npz, or IPTC cptall .json, to start from")
+    arg_parser.add_argument("--save-taxonomy", help="write the taxonomy to this .npz file")
+    arg_parser.add_argument("--level", type=int, help="only rank this IPTC level (1 is the top level)")
+    arg_parser.add_argument("--how", choices=["max", "sum"], default="max")
+    arg_parser.add_argument("--top", type=int, default=20)
+    arg_parser.add_argument("--topics", action="store_true", help="rank the topics instead of the categories")
+    args = arg_parser.parse_args(argv)
+
+    taxonomy = Taxonomy()
+    if args.taxonomy and args.taxonomy.endswith(".json"):
+        taxonomy = Taxonomy.from_iptc_json(args.taxonomy)
+    elif args.taxonomy:
+        taxonomy = Taxonomy.load(args.taxonomy)
+
+    field = "topics" if args.topics else "categories"
+    documents = []
+    with open(args.crawl) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in result and field in result:
+                documents.append(result[field])
+
+    docs, nodes, scores = cells(taxonomy, documents)
+    depth = args.level - 1 if args.level else None
+    for path, score, count in taxonomy.summary(docs, nodes, scores, len(documents), depth, args.how, args.top):
+        print("{0:8.3f} {1:6d}  {2}".format(score, count, path))
+    if args.save_taxonomy:
+        taxonomy.save(args.save_taxonomy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""JSON-LD about/mentions markup built directly from entity records.
+
+The entity tables are turned into lightweight EntityRecord tuples, column by
+column, instead of being serialized to a JSON string and parsed back. The
+same records feed the single-page download buttons and bulk generation for
+thousands of crawled pages, where the compact (non-indented) output and the
+deduplicated Wikipedia lookups matter.
+"""
+import argparse
+import collections
+import json
+
+import utils
+
+
+EntityRecord = collections.namedtuple(
+    "EntityRecord", ["name", "description", "wikipedia_link", "wikidata_id", "kg_id"]
+)
+
+COLUMNS = {
+    "name": "name",
+    "description": "description",
+    "wikipedia_link": "Wikipedia Link",
+    "wikidata_id": "Wikidata Id",
+    "kg_id": "Knowledge Graph ID",
+}
+
+HEADER = '<script type="application/ld+json">\n'
+FOOTER = "\n</script>"
+
+
+def _value(value):
+    # DataFrame columns hold NaN where a row had no value
+    if value is None or value != value or value == "":
+        return None
+    return value
+
+
+def from_row(row):
+    """Build a record from an entity row.
+
+    Args:
+        row (dict): an entity row, as built by utils.text_razor_rows & co.
+
+    Returns:
+        EntityRecord: the record.
+    """
+    return EntityRecord(*[_value(row.get(column)) for column in COLUMNS.values()])
+
+
+def records(df, names=None):
+    """Build the records of an entity table, without any JSON round-trip.
+
+    Args:
+        df (DataFrame): the entity table.
+        names (list): only keep the entities with these names, if given.
+
+    Returns:
+        list: the EntityRecord of each row.
+    """
+    if names is not None:
+        df = df.loc[df["name"].isin(names)]
+    columns = [
+        df[column].tolist() if column in df else [None] * len(df)
+        for column in COLUMNS.values()
+    ]
+    return [EntityRecord(*[_value(v) for v in values]) for values in zip(*columns)]
+
+
+def schema_item(record, scrape_all, lang, summaries=None):
+    """Build the schema.org Thing of a record.
+
+    Args:
+        record (EntityRecord): the entity.
+        scrape_all (boolean): if True, descriptions were scraped in the table
+            and no Wikipedia lookup is made for records without one.
+        lang (str): the language of the data.
+        summaries (dict): a name -> description cache shared across calls.
+
+    Returns:
+        dict: the Thing.
+    """
+    item = {
+        "@context": "http://schema.org",
+        "@type": "Thing",
+        "name": record.name,
+    }
+    if record.description:
+        item["description"] = record.description
+    elif not scrape_all:
+        if summaries is None:
+            item["description"] = utils.get_summary_link(record.name, lang)[0]
+        else:
+            if record.name not in summaries:
+                summaries[record.name] = utils.get_summary_link(record.name, lang)[0]
+            item["description"] = summaries[record.name]
+
+    if record.wikipedia_link and record.wikidata_id:
+        item["SameAs"] = [
+            record.wikipedia_link,
+            "https://www.wikidata.org/wiki/" + record.wikidata_id,
+        ]
+    elif record.wikipedia_link:
+        item["SameAs"] = [record.wikipedia_link]
+    elif record.wikidata_id:
+        item["SameAs"] = ["https://www.wikidata.org/wiki/" + record.wikidata_id]
+    else:
+        same_as = utils.get_local_same_as({
+            "name": record.name,
+            "Wikidata Id": record.wikidata_id,
+            "Knowledge Graph ID": record.kg_id,
+        }, lang)
+        if same_as:
+            item["SameAs"] = same_as
+    return item
+
+
+def render(schema_type, entity_records, scrape_all, lang, compact=False, summaries=None):
+    """Render the about or mentions markup of a page.
+
+    Args:
+        schema_type (str): name of the schema, can be (about, mentions).
+        entity_records (list): the EntityRecord list.
+        scrape_all (boolean): see schema_item.
+        lang (str): the language of the data.
+        compact (boolean): if True, no indentation or newlines.
+        summaries (dict): a name -> description cache shared across calls.
+
+    Returns:
+        str: the <script> element.
+    """
+    result = [schema_item(r, scrape_all, lang, summaries) for r in entity_records]
+    if compact:
+        return HEADER.strip() + json.dumps([{schema_type: result}], separators=(",", ":")) + FOOTER.strip()
+    return HEADER + json.dumps([{schema_type: result}], indent=4 * ' ') + FOOTER
+
+
+def render_pages(pages, lang, scrape_all=True, compact=True):
+    """Render the markup of many pages in one batch.
+
+    Each distinct entity name is looked up on Wikipedia at most once for the
+    whole batch.
+
+    Args:
+        pages (iterable): (page id, about records, mentions records) tuples.
+        lang (str): the language of the pages.
+        scrape_all (boolean): see schema_item.
+        compact (boolean): if True, no indentation or newlines.
+
+    Yields:
+        tuple: the page id and its markup, about and mentions concatenated.
+    """
+    summaries = {}
+    for page_id, about, mentions in pages:
+        markup = []
+        if about:
+            markup.append(render("about", about, scrape_all, lang, compact, summaries))
+        if mentions:
+            markup.append(render("mentions", mentions, scrape_all, lang, compact, summaries))
+        yield page_id, "\n".join(markup)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Render the JSON-LD markup of the pages of a crawl.")
+    arg_parser.add_argument("crawl", help="JSON Lines output of crawler.py")
+    arg_parser.add_argument("--out", required=True, help="JSON Lines output, one url/markup object per page")
+    arg_parser.add_argument("--about", type=int, default=2, help="entities marked as about, the first ones of each page")
+    arg_parser.add_argument("--mentions", type=int, default=5, help="entities marked as mentions, the ones after them")
+    arg_parser.add_argument("--lang", choices=["eng", "ita"], default="eng", help="language of the Wikipedia lookups")
+    arg_parser.add_argument("--lookup", action="store_true", help="look up the descriptions missing from the crawl")
+    arg_parser.add_argument("--indent", action="store_true", help="indented instead of compact markup")
+    args = arg_parser.parse_args(argv)
+
+    def pages():
+        with open(args.crawl) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if "error" in result or not result.get("entities"):
+                    continue
+                rows = [from_row(row) for row in result["entities"]]
+                yield result["url"], rows[:args.about], rows[args.about:args.about + args.mentions]
+
+    count = 0
+    with open(args.out, "w") as f:
+        for url, markup in render_pages(pages(), args.lang, not args.lookup, not args.indent):
+            f.write(json.dumps({"url": url, "markup": markup}, ensure_ascii=False) + "\n")
+            count += 1
+    print("Rendered the markup of {0} pages".format(count))
+
+
+if __name__ == "__main__":
+    main()
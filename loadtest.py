@@ -0,0 +1,267 @@
+"""Concurrent-session load test for the analysis pipeline.
+
+Streamlit runs every session's script on its own thread of one server
+process. This harness does the same with N simulated sessions, each driving
+the app's flows through the same code main.py calls:
+
+    submit    construct the analyzer, analyze, build the entity table,
+              count frequencies and store the results of the session
+    select    reload the table, sort it and pick about/mentions entities
+    download  render the about/mentions JSON-LD and the CSV download links
+
+The flows call the same utils helpers as main.py, but not the Streamlit
+script itself: the numbers measure the analysis, store and enrichment layer
+under concurrency, not the widgets and rendering of the app.
+
+The providers are local stubs with configurable latency, so the test runs
+offline and costs no quota; the Wikipedia lookups (get_summary_link) are
+stubbed the same way. For each concurrency level it reports the throughput,
+the p50/p95/p99 latency of each flow and the server memory.
+
+    python loadtest.py --concurrency 1,4,16,64 --sessions 200 --scrape-all
+"""
+import argparse
+import json
+import random
+import resource
+import sys
+import threading
+import time
+
+import pandas as pd
+
+import enrichment
+import jsonld
+import session_store
+import utils
+
+
+WORDS = ["Rome", "Paris", "Milan", "Semantic Web", "Schema.org", "Google",
+         "Wikipedia", "Knowledge Graph", "Search engine", "Python"]
+
+
+class StubEntity:
+    def __init__(self, i):
+        """ A TextRazor-like entity
+
+        Args:
+            i (int): The entity number
+        """
+        self.id = "{0} {1}".format(WORDS[i % len(WORDS)], i)
+        self.confidence_score = 1 + random.random() * 10
+        self.relevance_score = random.random()
+        self.wikidata_id = "Q{0}".format(1000 + i)
+        self.wikipedia_link = "https://en.wikipedia.org/wiki/Entity_{0}".format(i)
+        self.dbpedia_types = ["http://dbpedia.org/ontology/Thing"]
+        self.freebase_types = []
+
+
+class StubResponse:
+    def __init__(self, n_entities, n_words):
+        """ A TextRazor-like response
+
+        Args:
+            n_entities (int): The number of entities
+            n_words (int): The length of the cleaned text, in words
+        """
+        self._entities = [StubEntity(i) for i in range(n_entities)]
+        self.language = "eng"
+        self.cleaned_text = " ".join(random.choice(WORDS) for _ in range(n_words))
+
+    def entities(self):
+        return self._entities
+
+
+class StubAnalyzer:
+    def __init__(self, options):
+        """ A provider stub, constructed per submit like the real analyzers
+
+        Args:
+            options (Namespace): The load test options
+        """
+        time.sleep(options.construct_latency)
+        self.options = options
+
+    def analyze(self, text, is_url):
+        time.sleep(self.options.api_latency)
+        return StubResponse(self.options.entities, self.options.words)
+
+
+def stub_summary_link(latency):
+    """Build a get_summary_link stub with a fixed latency.
+
+    Args:
+        latency (float): the lookup latency in seconds.
+
+    Returns:
+        callable: the stub.
+    """
+    def get_summary_link(title, lang):
+        time.sleep(latency)
+        return "Description of " + title, "https://en.wikipedia.org/wiki/" + title, ""
+    return get_summary_link
+
+
+def percentile(values, p):
+    """Get a percentile of a list of values (nearest rank)."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def rss_bytes():
+    """Get the current resident memory of the process.
+
+    Returns:
+        int: the resident set size, or the peak one if unavailable.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def submit(results, options):
+    analyzer = StubAnalyzer(options)
+    response = analyzer.analyze("https://example.com/", True)
+    output = utils.text_razor_rows(response, False)
+    results["text"] = response.cleaned_text
+    df = pd.DataFrame(output)
+    results["df_razor"] = df
+    if options.scrape_all:
+        task = enrichment.EnrichmentTask([row["name"] for row in output], response.language)
+        while not task.done():
+            time.sleep(0.01)
+    return response.language
+
+
+def select(results, language):
+    df = utils.sort_entities(results["df_razor"], "Relevance Score")
+    utils.add_frequency(df, results["text"], language)
+    utils.conf(df, "Confidence Score")
+    return df, list(df["name"][:2]), list(df["name"][2:7])
+
+
+def download(df, about, mentions, language, scrape_all):
+    for schema_type, names in (("about", about), ("mentions", mentions)):
+        markup = utils.convert_schema(schema_type, jsonld.records(df, names), scrape_all, language)
+        utils.download_button(markup, schema_type + "-entities.json", "Download", pickle_it=False)
+    utils.download_button(df, "entities.csv", "Download", pickle_it=False)
+
+
+def run_session(store, options, timings, lock):
+    """Drive one simulated session through submit/select/download flows.
+
+    Args:
+        store (SessionStore): the process-wide result store.
+        options (Namespace): the load test options.
+        timings (dict): flow name -> list of latencies, appended to.
+        lock (Lock): protects timings.
+    """
+    results = session_store.SessionResults(store, "load-{0}".format(random.getrandbits(64)))
+    local = {"submit": [], "select": [], "download": []}
+    start = time.perf_counter()
+    language = submit(results, options)
+    local["submit"].append(time.perf_counter() - start)
+    for _ in range(options.reruns):
+        start = time.perf_counter()
+        df, about, mentions = select(results, language)
+        local["select"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        download(df, about, mentions, language, options.scrape_all)
+        local["download"].append(time.perf_counter() - start)
+    with lock:
+        for flow, values in local.items():
+            timings[flow].extend(values)
+
+
+def run_level(concurrency, options):
+    """Run options.sessions sessions, concurrency of them at a time.
+
+    Returns:
+        dict: the throughput, latency percentiles and memory of the level.
+    """
+    store = session_store.get_store()
+    timings = {"submit": [], "select": [], "download": []}
+    lock = threading.Lock()
+    remaining = [options.sessions]
+    peak_rss = [rss_bytes()]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            run_session(store, options, timings, lock)
+            rss = rss_bytes()
+            with lock:
+                peak_rss[0] = max(peak_rss[0], rss)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    footprint = store.footprint()
+    report = {
+        "concurrency": concurrency,
+        "sessions": options.sessions,
+        "duration_s": duration,
+        "sessions_per_s": options.sessions / duration,
+        "peak_rss_mb": peak_rss[0] / 2**20,
+        "store_memory_mb": footprint["memory"] / 2**20,
+        "store_disk_mb": footprint["disk"] / 2**20,
+    }
+    for flow, values in timings.items():
+        for p in (50, 95, 99):
+            report["{0}_p{1}_ms".format(flow, p)] = percentile(values, p) * 1000
+    for session_id in list(footprint["sessions"]):
+        store.drop_session(session_id)
+    return report
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Load test the analysis flows with N concurrent sessions.")
+    arg_parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    arg_parser.add_argument("--sessions", type=int, default=50, help="sessions per level")
+    arg_parser.add_argument("--reruns", type=int, default=3, help="select/download reruns per session")
+    arg_parser.add_argument("--entities", type=int, default=50, help="entities per response")
+    arg_parser.add_argument("--words", type=int, default=2000, help="words per analyzed text")
+    arg_parser.add_argument("--api-latency", type=float, default=0.3, help="provider call latency (s)")
+    arg_parser.add_argument("--construct-latency", type=float, default=0.01, help="analyzer construction latency (s)")
+    arg_parser.add_argument("--wiki-latency", type=float, default=0.05, help="Wikipedia lookup latency (s)")
+    arg_parser.add_argument("--scrape-all", action="store_true", help="enrich every entity from Wikipedia")
+    arg_parser.add_argument("--json", help="also write the reports to this JSON file")
+    arg_parser.add_argument("--max-p95-ms", type=float, help="exit with status 1 if a submit p95 exceeds this")
+    options = arg_parser.parse_args(argv)
+
+    utils.get_summary_link = stub_summary_link(options.wiki_latency)
+
+    reports = []
+    columns = ["concurrency", "sessions_per_s", "submit_p50_ms", "submit_p95_ms", "submit_p99_ms",
+               "select_p95_ms", "download_p95_ms", "peak_rss_mb", "store_memory_mb"]
+    print(" ".join("{0:>15}".format(c) for c in columns))
+    for level in [int(c) for c in options.concurrency.split(",")]:
+        report = run_level(level, options)
+        reports.append(report)
+        print(" ".join("{0:>15.1f}".format(report[c]) for c in columns))
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(reports, f, indent=4)
+    if options.max_p95_ms and any(r["submit_p95_ms"] > options.max_p95_ms for r in reports):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 from logging import log
 import os
 import json
-import numpy as np
 
 
 #import snowballstemmer
@@ -11,17 +10,20 @@ import numpy as np
 # response.raise_for_status()  # raises exception when not a 2xx response
 
 
-from streamlit_lottie import st_lottie
 from io import StringIO
 
-import spacy
-from spacy_streamlit import visualize_parser
-
 import pandas as pd
 import streamlit as st
 
+import enrichment
+import iptc
+import jsonld
+import profiling
+import session_store
 import utils
+import warmup
 import time
+warmup.start()
 author_textrazor_token = os.getenv("TEXTRAZOR_TOKEN")
 author_google_key = os.getenv("GOOGLE_KEY")
 #print(author_google_key)
@@ -47,13 +49,6 @@ hide_st_style = """
             """
 st.markdown(hide_st_style, unsafe_allow_html=True)
 
-# if "en_nlp" not in st.session_state:
-#     st.session_state.en_nlp = spacy.load("en_core_web_sm")
-
-# if "it_nlp" not in st.session_state:
-#     st.session_state.it_nlp = spacy.load("it_core_news_sm")
-
-
 # @st.cache(suppress_st_warning=True) 
 # def logo():
 # @st.cache(allow_output_mutation=True)
@@ -83,18 +78,23 @@ def load_lottifile(filepath: str):
 loti_path = load_lottifile('data.json')
 #st.title('Lotti')
 with st.sidebar:
-    
+    from streamlit_lottie import st_lottie
+
     #time.sleep(3)
     st_lottie(loti_path, width=280, height=180, loop=False)
 
+results = session_store.session_results(st.session_state)
 df = None
+entities_placeholder = None
+profiler = None
+italian_links = True
 texts=None  #initialize for 
 language_option= None
 #response2 = None
 with st.form("my_form"):
     api_selectbox = st.sidebar.selectbox(
         "Choose the API you wish to use",
-        ("TextRazor", "Google NLP")
+        ("TextRazor", "Google NLP", "spaCy (offline)")
     )
     input_type_selectbox = st.sidebar.selectbox(
         "Choose what you want to analyze",
@@ -104,6 +104,7 @@ with st.form("my_form"):
     st.sidebar.info('##### Read this article to [learn more about how to use The Entities Swissknife](https://studiomakoto.it/digital-marketing/entity-seo-semantic-publishing/).')
     st.sidebar.info('##### Register on the [TextRazor website](https://www.textrazor.com/) to obtain a free API keyword (🙌 500 calls/day 🙌) or activate the [NLP API](https://cloud.google.com/natural-language) inside your Google Cloud Console, and export the JSON authentication file.') 
     st.sidebar.info('##### Knowledge Graph Entity ID is extracted only using the Google NLP API.')
+    st.sidebar.info('##### spaCy (offline) runs the Named-Entity Recognition locally: no API key, no quota, but no Entity Linking and an approximated Salience.')
     st.sidebar.info('##### Categories and Topics - by [IPTC Media Topics](https://iptc.org/standards/media-topics/) - are avalaible only using the TextRazor API.') 
    
     # loti_path = load_lottifile('lotti/seo.json')
@@ -148,9 +149,11 @@ The table with the "Top Entities by Frequency" takes into account for the Freque
            """
         )
 
+    spacy_lang = None
     if api_selectbox == "TextRazor":
         google_api = None
         st.session_state.google_api = False
+        st.session_state.spacy_ner = False
         if not author_textrazor_token:
             text_razor_key = st.text_input('Please enter a valid TextRazor API Key (Required)')
         else:
@@ -158,6 +161,7 @@ The table with the "Top Entities by Frequency" takes into account for the Freque
     elif api_selectbox == "Google NLP":
         text_razor_key = None
         st.session_state.text_razor = False
+        st.session_state.spacy_ner = False
         if not author_google_key:
             google_api = st.file_uploader("Please upload a valid Google NLP API Key (Required)", type=["json"])
             if google_api:
@@ -165,6 +169,12 @@ The table with the "Top Entities by Frequency" takes into account for the Freque
         else:
             google_api = json.loads(author_google_key)
             #print(google_api)
+    elif api_selectbox == "spaCy (offline)":
+        text_razor_key = None
+        google_api = None
+        st.session_state.text_razor = False
+        st.session_state.google_api = False
+        spacy_lang = st.sidebar.selectbox("Choose the language of the text", ("eng", "ita"), format_func=lambda x: {"eng": "English", "ita": "Italian"}[x])
         
 
     if input_type_selectbox == "URL":
@@ -172,10 +182,12 @@ The table with the "Top Entities by Frequency" takes into account for the Freque
         #print('text_input 171 the first lien\n',text_input)
      
         meta_tags_only = st.checkbox('Extract Entities only from meta tags (tag_title, meta_description & H1-4)')
+        audit_markup = st.checkbox('Audit the JSON-LD markup already on the page (about, mentions & sameAs)')
         #print('172 meta tag', meta_tags_only)
         if "last_field_type" in st.session_state and st.session_state.last_field_type != input_type_selectbox:
             st.session_state.text_razor = False
             st.session_state.google_api = False
+            st.session_state.spacy_ner = False
         st.session_state.last_field_type = input_type_selectbox
     elif input_type_selectbox == "Text":
         
@@ -183,51 +195,78 @@ The table with the "Top Entities by Frequency" takes into account for the Freque
             st.session_state.last_field_type = input_type_selectbox
             st.session_state.text_razor = False
             st.session_state.google_api = False
+            st.session_state.spacy_ner = False
         if st.session_state.last_field_type != input_type_selectbox:
             st.session_state.text_razor = False
             st.session_state.google_api = False
+            st.session_state.spacy_ner = False
         st.session_state.last_field_type = input_type_selectbox
         meta_tags_only = False
+        audit_markup = False
         text_input = st.text_area('Please enter a text', placeholder='Posts involving Semantic SEO at Google include structured data, schema, and knowledge graphs, with SERPs that answer questions and rank entities - Bill Slawsky.')
     is_url = utils.is_url(text_input)
    # print('is_uri from 192 line\n', is_url)
-    # spacy_pos = st.checkbox('Process Part-of-Speech analysis with SpaCy')
-    spacy_pos = False
+    spacy_pos = st.checkbox('Process Part-of-Speech analysis with SpaCy')
     scrape_all = st.checkbox("Scrape ALL the Entities descriptions from Wikipedia. This is a time-consuming task, so grab a coffee if you need all the descriptions in your CSV file. The descriptions of the Entities you select for your 'about' and 'mentions' schema properties will be scraped and present in the corresponding JSON-LD files")
     #rint('Scrape all', scrape_all)
     if api_selectbox == "TextRazor":
         extract_categories_topics = st.checkbox('Extract Categories and Topics')
+    incremental_mode = False
+    if api_selectbox in ("TextRazor", "Google NLP"):
+        incremental_mode = st.checkbox('Incremental re-analysis: send to the API only the paragraphs changed since the last run (Categories and Topics are not extracted)')
     submitted = st.form_submit_button("Submit")
     if submitted:
 #         loti_path = load_lottifile('lotti/seo2.json')
 # #st.titl
 #         st_lottie(loti_path, width=280, height=130, loop=True)
 
-        if not text_razor_key and not google_api:
+        if not text_razor_key and not google_api and not spacy_lang:
             st.warning("Please fill out all the required fields")
         elif not text_input:
             st.warning("Please Enter a URL/Text in the required field")
         else:
             st.session_state.submit = True
-            if api_selectbox == "TextRazor":
-                output, response, topics_output, categories_output = utils.get_df_text_razor(text_razor_key, text_input, extract_categories_topics, is_url, scrape_all)
+            results.pop("profile", None)
+            if profiling.enabled(st.experimental_get_query_params()):
+                profiler = profiling.Sampler().start()
+            results.pop("jsonld_blocks", None)
+            if audit_markup and is_url:
+                results["jsonld_blocks"] = utils.get_jsonld_blocks(text_input)
+            # Text drafts are re-analyzed incrementally per session (their stored results
+            # expire like the session results), URLs across sessions
+            draft_id = None if is_url else "text-" + results.session_id
+            if api_selectbox == "TextRazor" and incremental_mode:
+                output, results["text"], language = utils.get_df_incremental("TextRazor", text_razor_key, text_input, is_url, False, draft_id)
+                texts = results["text"]
+                st.session_state.text_razor = True
+                results["df_razor"] = pd.DataFrame(output)
+                results.pop("df_razor_topics", None)
+                results.pop("df_razor_categories", None)
+            elif api_selectbox == "TextRazor":
+                output, response, topics_output, categories_output = utils.get_df_text_razor(text_razor_key, text_input, extract_categories_topics, is_url, False)
                 #print('output 167 line:\n', output) #-------------------------
                # print('response 213 line :\n',response)
-                st.session_state.text = response.cleaned_text
+                language = response.language
+                results["text"] = response.cleaned_text
                 #response1 = [response.cleaned_text]
                 #----------------------updated--------------
-                texts = st.session_state.text
+                texts = results["text"]
                 #--------------------end--------------------
                 #print('response.cleaned_text\n', response.cleaned_text)
                 #-------------------------------------------------------------------
                 st.session_state.text_razor = True
-                st.session_state.df_razor = pd.DataFrame(output)
+                results["df_razor"] = pd.DataFrame(output)
                 if topics_output:
-                    st.session_state.df_razor_topics = pd.DataFrame(topics_output)
+                    results["df_razor_topics"] = pd.DataFrame(topics_output)
                 if categories_output:
-                    st.session_state.df_razor_categories = pd.DataFrame(categories_output)
+                    results["df_razor_categories"] = pd.DataFrame(categories_output)
+            elif api_selectbox == "Google NLP" and incremental_mode:
+                output, results["text"], language = utils.get_df_incremental("Google NLP", google_api, text_input, is_url, False, draft_id)
+                st.session_state.google_api = True
+                results["df_google"] = pd.DataFrame(output)
             elif api_selectbox == "Google NLP":
-                output, response = utils.get_df_google_nlp(google_api, text_input, is_url, scrape_all)
+                output, response = utils.get_df_google_nlp(google_api, text_input, is_url, False)
+                language = response.language
                 #print('is_url', is_url)
                 #response1 = list(response)
                 response1 = [response]
@@ -243,58 +282,37 @@ The table with the "Top Entities by Frequency" takes into account for the Freque
                 #print('229 line response google api', response)
                 #print('201 text output', output)
                 # print('response', response.clean)
-                st.session_state.text = text_input  #just gives the url for google api text_intput from url
+                results["text"] = text_input  #just gives the url for google api text_intput from url
                 #print("text_input 233 output google api", text_input)
                 st.session_state.google_api = True
-                st.session_state.df_google = pd.DataFrame(output)
+                results["df_google"] = pd.DataFrame(output)
+            elif api_selectbox == "spaCy (offline)":
+                output, response = utils.get_df_spacy(spacy_lang, text_input, is_url, False)
+                language = response.language
+                results["text"] = response.cleaned_text
+                texts = results["text"]
+                st.session_state.spacy_ner = True
+                results["df_spacy"] = pd.DataFrame(output)
             
-            st.session_state.lang = response.language
-            language_option = response.language
+            st.session_state.lang = language
+            language_option = language
+            # Wikipedia lookups run in the background, see enrichment.py
+            st.session_state.pop("enrichment", None)
+            if scrape_all:
+                st.session_state.enrichment = enrichment.EnrichmentTask([row["name"] for row in output], language)
            # print('langu form==>', response.language)
 #---------------------------------------------Frequency Counter------------------
 #
 # @st.cache
 def word_frequency(df, text_input, language_option, texts= texts):
 
-        from nltk.stem.snowball import SnowballStemmer
-
-        if language_option == 'eng':
-
-            stemmer = SnowballStemmer(language='english')
-        else:
-
-            stemmer = SnowballStemmer(language='italian')
-
-        #stemmer = snowballstemmer.stemmer('english')
         #if len(texts) >0 :
         if texts==None:
             #text_input = texts
             text_input= text_input
         else:
             text_input=texts
-        tokens = text_input.split()
-        stem_words = []
-        for token in tokens:
-            stem_words.append(stemmer.stem(token))
-            #stem_words.append(stemmer.stemWords(token))
-           
-        word_count = []
-        txt = text_input.lower()
-        for word in list(df['name']):
-            word = word.lower()
-            stem_word = stemmer.stem(word)
-            #stem_word = stemmer.stemWords(word)
-            count = txt.count(word)
-            if count == 0 :
-                
-                count = stem_words.count(stem_word)
-                word_count.append(count)
-                continue
-           
-
-            word_count.append(count)
-        df = df.insert(loc=3, column='Frequency', value=np.array(word_count)) 
-        return df
+        utils.add_frequency(df, text_input, language_option)
 #-------------------------------------------end----------------------------------------------
 # #----------------------------Convert Confidence score value into percentage----------------------
 # def conf(col):
@@ -305,17 +323,22 @@ def word_frequency(df, text_input, language_option, texts= texts):
 
 
 
+# The store drops the results of idle sessions (TES_SESSION_TTL): ask to submit again
+for flag, name in (("text_razor", "df_razor"), ("google_api", "df_google"), ("spacy_ner", "df_spacy")):
+    if st.session_state.get(flag) and (name not in results or "text" not in results):
+        st.session_state[flag] = False
+        st.session_state.pop("submit", None)
+        st.warning("The results of this session have expired, please submit again")
+
 if 'submit' in st.session_state and ("text_razor" in st.session_state and st.session_state.text_razor == True):
     text_input, is_url = utils.write_meta(text_input, meta_tags_only, is_url)
    # print('text_input\n', text_input)
    # print('is_url\n', is_url)
-    if 'df_razor' in st.session_state:
-        df = st.session_state["df_razor"]
+    if 'df_razor' in results:
+        df = results["df_razor"]
 
     if len(df) > 0:
-        df['temp'] = df['Relevance Score'].str.strip('%').astype(float)
-        df = df.sort_values('temp', ascending=False)
-        del df['temp']
+        df = utils.sort_entities(df, 'Relevance Score')
         selected_about_names = st.multiselect('Select About Entities:', df.name)
         selected_mention_names = st.multiselect('Select Mentions Entities:', df.name)
         #--------------Frequency count--------------
@@ -324,36 +347,45 @@ if 'submit' in st.session_state and ("text_razor" in st.session_state and st.ses
     #print(is_url)
     #print(text_input)
     utils.conf(df, "Confidence Score")
-    st.write('### Entities', df)
+    italian_links = False
+    if scrape_all and "enrichment" in st.session_state:
+        df = enrichment.apply(df, st.session_state.enrichment, italian_links)
+    st.write('### Entities')
+    entities_placeholder = st.empty()
+    entities_placeholder.write(df)
     #st.write('#### Entity table Dimension', df.shape)
     df1 = df.sort_values('Frequency', ascending=False)
     st.write('### Top 10 Entities by Frequency', df1[['name', 'Frequency']].head(10))
     #st.write(response1)
 
     c, t = st.columns(2)
-    if 'df_razor_categories' in st.session_state and extract_categories_topics:
+    if 'df_razor_categories' in results and extract_categories_topics:
         with c:
-            df_categories = st.session_state["df_razor_categories"]
+            df_categories = results["df_razor_categories"]
             st.write('### Categories', df_categories)
-    if 'df_razor_topics' in st.session_state and extract_categories_topics:
+            if "path" in df_categories:
+                st.write('### Categories by IPTC level', pd.DataFrame(iptc.document_rollup(df_categories.to_dict("records"))))
+    if 'df_razor_topics' in results and extract_categories_topics:
         with t:
-            df_topics = st.session_state["df_razor_topics"]
+            df_topics = results["df_razor_topics"]
             st.write('### Topics', df_topics)
     
     if len(df) > 0:
-        about_download_button = utils.download_button(utils.convert_schema("about", df.loc[df['name'].isin(selected_about_names)].to_json(orient='records'), scrape_all, st.session_state.lang), 'about-entities.json', 'Download About Entities JSON-LD ✨', pickle_it=False)
-        if len(df.loc[df['name'].isin(selected_about_names)]) > 0:
+        about_records = jsonld.records(df, selected_about_names)
+        if about_records:
+            about_download_button = utils.download_button(utils.convert_schema("about", about_records, scrape_all, st.session_state.lang), 'about-entities.json', 'Download About Entities JSON-LD ✨', pickle_it=False)
             st.markdown(about_download_button, unsafe_allow_html=True)
-        mention_download_button = utils.download_button(utils.convert_schema("mentions", df.loc[df['name'].isin(selected_mention_names)].to_json(orient='records'), scrape_all, st.session_state.lang), 'mentions-entities.json', 'Download Mentions Entities JSON-LD ✨', pickle_it=False)
-        if len(df.loc[df['name'].isin(selected_mention_names)]) > 0:
+        mention_records = jsonld.records(df, selected_mention_names)
+        if mention_records:
+            mention_download_button = utils.download_button(utils.convert_schema("mentions", mention_records, scrape_all, st.session_state.lang), 'mentions-entities.json', 'Download Mentions Entities JSON-LD ✨', pickle_it=False)
             st.markdown(mention_download_button, unsafe_allow_html=True)
-    if "df_razor_topics" in st.session_state and extract_categories_topics:
-        df_topics = st.session_state["df_razor_topics"]
+    if "df_razor_topics" in results and extract_categories_topics:
+        df_topics = results["df_razor_topics"]
         download_buttons = ""
         download_buttons += utils.download_button(df_topics, 'topics.csv', 'Download all Topics CSV ✨', pickle_it=False)
         st.markdown(download_buttons, unsafe_allow_html=True)
-    if "df_razor_categories" in st.session_state and extract_categories_topics:
-        df_categories = st.session_state["df_razor_categories"]
+    if "df_razor_categories" in results and extract_categories_topics:
+        df_categories = results["df_razor_categories"]
         download_buttons = ""
         download_buttons += utils.download_button(df_categories, 'categories.csv', 'Download all Categories CSV ✨', pickle_it=False)
         st.markdown(download_buttons, unsafe_allow_html=True)
@@ -361,14 +393,10 @@ if 'submit' in st.session_state and ("text_razor" in st.session_state and st.ses
         download_buttons = ""
         download_buttons += utils.download_button(df, 'entities.csv', 'Download all Entities CSV ✨', pickle_it=False)
         st.markdown(download_buttons, unsafe_allow_html=True)
+    if audit_markup and "jsonld_blocks" in results and len(df) > 0:
+        utils.show_markup_audit(results["jsonld_blocks"], df)
     if spacy_pos:
-        if st.session_state.lang in "eng":
-            #print('textrazor-eng lang\n', st.session_state.lang)
-            doc = st.session_state.en_nlp(st.session_state.text)
-        elif st.session_state.lang in "ita":
-            #print('textrazor-ita lang\n', st.session_state.lang)
-            doc = st.session_state.it_nlp(st.session_state.text)
-        visualize_parser(doc)
+        utils.show_pos(results["text"], st.session_state.lang)
 #---------------------google api frequency count-----------------
 # def word_frequency1(df, response2):
     
@@ -383,25 +411,27 @@ if 'submit' in st.session_state and ("text_razor" in st.session_state and st.ses
 #             print('inside funtion response1\n')
 #             word_count.append(count)
             
-#         df = df.insert(loc=3, column='Frequency', value=np.array(word_count))
+#         df = df.insert(loc=3, column='Frequency', value=word_count)
 #        # df['Frequency2'] = df['Frequency2'].astype('int64')
 #         return df
 if 'submit' in st.session_state and ("google_api" in st.session_state and st.session_state.google_api == True):
     text_input, is_url = utils.write_meta(text_input, meta_tags_only, is_url)
     # st.write('text_input 380|', text_input)
     # st.write('is url 380\n', is_url)
-    if 'df_google' in st.session_state:
-        df = st.session_state["df_google"]
+    if 'df_google' in results:
+        df = results["df_google"]
     if len(df) > 0:
-        df['temp'] = df['Salience'].str.strip('%').astype(float)
-        df = df.sort_values('temp', ascending=False)
-        del df['temp']
+        df = utils.sort_entities(df, 'Salience')
         selected_about_names = st.multiselect('Select About Entities:', df.name)
         selected_mention_names = st.multiselect('Select Mentions Entities:', df.name)
         #---------------------frequency counter
     #response1 = [response]
     utils.conf(df, "Confidence Score")
-    st.write('### Entities', df)
+    if scrape_all and "enrichment" in st.session_state:
+        df = enrichment.apply(df, st.session_state.enrichment)
+    st.write('### Entities')
+    entities_placeholder = st.empty()
+    entities_placeholder.write(df)
     # if not is_url:
     #     word_frequency(df, text_input, language_option, texts) 
     # # else:
@@ -420,20 +450,62 @@ if 'submit' in st.session_state and ("google_api" in st.session_state and st.ses
     #st.write(type(response2))
     
     if len(df) > 0:
-        about_download_button = utils.download_button(utils.convert_schema("about", df.loc[df['name'].isin(selected_about_names)].to_json(orient='records'), scrape_all, st.session_state.lang), 'about-entities.json', 'Download About Entities JSON-LD ✨', pickle_it=False)
-        if len(df.loc[df['name'].isin(selected_about_names)]) > 0:
+        about_records = jsonld.records(df, selected_about_names)
+        if about_records:
+            about_download_button = utils.download_button(utils.convert_schema("about", about_records, scrape_all, st.session_state.lang), 'about-entities.json', 'Download About Entities JSON-LD ✨', pickle_it=False)
+            st.markdown(about_download_button, unsafe_allow_html=True)
+        mention_records = jsonld.records(df, selected_mention_names)
+        if mention_records:
+            mention_download_button = utils.download_button(utils.convert_schema("mentions", mention_records, scrape_all, st.session_state.lang), 'mentions-entities.json', 'Download Mentions Entities JSON-LD ✨', pickle_it=False)
+            st.markdown(mention_download_button, unsafe_allow_html=True)
+        download_buttons = ""
+        download_buttons += utils.download_button(df, 'entities.csv', 'Download all Entities CSV ✨', pickle_it=False)
+        st.markdown(download_buttons, unsafe_allow_html=True)
+    if audit_markup and "jsonld_blocks" in results and len(df) > 0:
+        utils.show_markup_audit(results["jsonld_blocks"], df)
+    if spacy_pos:
+        utils.show_pos(results["text"], st.session_state.lang)
+if 'submit' in st.session_state and ("spacy_ner" in st.session_state and st.session_state.spacy_ner == True):
+    text_input, is_url = utils.write_meta(text_input, meta_tags_only, is_url)
+    if 'df_spacy' in results:
+        df = results["df_spacy"]
+    if len(df) > 0:
+        df = utils.sort_entities(df, 'Salience')
+        selected_about_names = st.multiselect('Select About Entities:', df.name)
+        selected_mention_names = st.multiselect('Select Mentions Entities:', df.name)
+        word_frequency(df, text_input, st.session_state.lang, results["text"])
+    if scrape_all and "enrichment" in st.session_state:
+        df = enrichment.apply(df, st.session_state.enrichment)
+    st.write('### Entities')
+    entities_placeholder = st.empty()
+    entities_placeholder.write(df)
+    if len(df) > 0:
+        df1 = df.sort_values('Frequency', ascending=False)
+        st.write('### Top 10 Entities by Frequency', df1[['name', 'Frequency']].head(10))
+        about_records = jsonld.records(df, selected_about_names)
+        if about_records:
+            about_download_button = utils.download_button(utils.convert_schema("about", about_records, scrape_all, st.session_state.lang), 'about-entities.json', 'Download About Entities JSON-LD ✨', pickle_it=False)
             st.markdown(about_download_button, unsafe_allow_html=True)
-        mention_download_button = utils.download_button(utils.convert_schema("mentions", df.loc[df['name'].isin(selected_mention_names)].to_json(orient='records'), scrape_all, st.session_state.lang), 'mentions-entities.json', 'Download Mentions Entities JSON-LD ✨', pickle_it=False)
-        if len(df.loc[df['name'].isin(selected_mention_names)]) > 0:
+        mention_records = jsonld.records(df, selected_mention_names)
+        if mention_records:
+            mention_download_button = utils.download_button(utils.convert_schema("mentions", mention_records, scrape_all, st.session_state.lang), 'mentions-entities.json', 'Download Mentions Entities JSON-LD ✨', pickle_it=False)
             st.markdown(mention_download_button, unsafe_allow_html=True)
         download_buttons = ""
         download_buttons += utils.download_button(df, 'entities.csv', 'Download all Entities CSV ✨', pickle_it=False)
         st.markdown(download_buttons, unsafe_allow_html=True)
+    if audit_markup and "jsonld_blocks" in results and len(df) > 0:
+        utils.show_markup_audit(results["jsonld_blocks"], df)
     if spacy_pos:
-        if st.session_state.lang in "eng":
-            doc = st.session_state.en_nlp(st.session_state.text)
-            #print('English', doc)
-        elif st.session_state.lang in "ita":
-            doc = st.session_state.it_nlp(st.session_state.text)
-            #print('Itelian')
-        visualize_parser(doc)
+        utils.show_pos(results["text"], st.session_state.lang)
+if profiler is not None:
+    results["profile"] = profiler.stop().report()
+if "profile" in results:
+    with st.sidebar.expander("Profile of the last analysis"):
+        utils.show_profile(results["profile"])
+with st.sidebar.expander("Memory usage"):
+    footprint = results.store.footprint()
+    usage = footprint["sessions"].get(results.session_id, {"memory": 0, "disk": 0, "spilled": 0})
+    st.write(f"This session: {usage['memory'] / 2**20:.1f} MB in memory, {usage['disk'] / 2**20:.1f} MB spilled to disk")
+    st.write(f"All {len(footprint['sessions'])} sessions: {footprint['memory'] / 2**20:.1f} MB of {footprint['budget'] / 2**20:.0f} MB in memory, {footprint['disk'] / 2**20:.1f} MB on disk")
+if scrape_all and entities_placeholder is not None and "enrichment" in st.session_state:
+    enrichment.follow(entities_placeholder, df, st.session_state.enrichment, italian_links)
@@ -0,0 +1,204 @@
+"""Audit of the structured data already published on a page.
+
+The JSON-LD blocks are pulled out with a targeted scan for
+``<script type="application/ld+json">`` elements instead of a full HTML parse,
+so the audit is cheap enough to run on every URL of a batch. The about,
+mentions and sameAs properties found in them are then compared with the
+entities detected by the analyzer.
+"""
+import html as html_lib
+import json
+import re
+
+
+JSONLD_SCRIPT = re.compile(
+    r"<script\b[^>]*\btype\s*=\s*[\"']?application/ld\+json[\"']?[^>]*>(.*?)</script\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+WRAPPERS = re.compile(r"^\s*(?:<!--|<!\[CDATA\[)|(?:-->|\]\]>)\s*$")
+
+PROPERTIES = ("about", "mentions")
+
+
+def extract_jsonld_blocks(html):
+    """Extract and parse every JSON-LD block of a page.
+
+    Args:
+        html (str or bytes): the HTML of the page.
+
+    Returns:
+        list: the parsed blocks, in page order. Invalid blocks are skipped.
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    blocks = []
+    for match in JSONLD_SCRIPT.finditer(html):
+        content = WRAPPERS.sub("", match.group(1)).strip()
+        if not content:
+            continue
+        try:
+            blocks.append(json.loads(content))
+        except ValueError:
+            try:
+                blocks.append(json.loads(html_lib.unescape(content), strict=False))
+            except ValueError:
+                continue
+    return blocks
+
+
+def _nodes(data):
+    if isinstance(data, list):
+        for item in data:
+            yield from _nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                yield from _nodes(value)
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _text(value):
+    # A JSON-LD value: a string, a list of values or a {"@value": ...} object
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        for item in value:
+            text = _text(item)
+            if text:
+                return text
+        return ""
+    if isinstance(value, dict):
+        return _text(value.get("@value"))
+    return ""
+
+
+def _link(value):
+    # A sameAs entry: a URL, or a node reference {"@id": URL}
+    if isinstance(value, dict):
+        value = value.get("@id")
+    return value if isinstance(value, str) and value.strip() else None
+
+
+def normalize_url(url):
+    """Normalize a URL for comparison (scheme, case, trailing slash).
+
+    Args:
+        url (str): the URL.
+
+    Returns:
+        str: the normalized URL.
+    """
+    url = str(url).strip().replace("http://", "https://", 1)
+    url = re.sub(r"^https://(www\.)?", "https://", url)
+    return url.rstrip("/").lower().replace(" ", "_")
+
+
+def declared_entities(blocks):
+    """Collect the entities declared in about/mentions properties.
+
+    Args:
+        blocks (list): the parsed JSON-LD blocks.
+
+    Returns:
+        dict: property name -> list of {"name", "sameAs"} dicts.
+    """
+    declared = {prop: [] for prop in PROPERTIES}
+    for node in _nodes(blocks):
+        for prop in PROPERTIES:
+            for thing in _as_list(node.get(prop)):
+                if isinstance(thing, str):
+                    thing = {"name": thing}
+                if not isinstance(thing, dict):
+                    continue
+                same_as = _as_list(thing.get("sameAs", thing.get("SameAs"))) + [thing.get("@id")]
+                declared[prop].append({
+                    "name": _text(thing.get("name")),
+                    "sameAs": [link for link in map(_link, same_as) if link],
+                })
+    return declared
+
+
+def detected_links(row):
+    """Get the URLs identifying a detected entity row.
+
+    Args:
+        row (dict): an entity row.
+
+    Returns:
+        dict: normalized URL -> URL, for the Wikipedia, Wikidata and
+            Knowledge Graph URLs of the row.
+    """
+    links = []
+    for column in ("Wikipedia Link", "English Wikipedia Link", "Italian Wikipedia Link", "Knowledge Graph ID"):
+        if row.get(column):
+            links.append(row[column])
+    if row.get("Wikidata Id"):
+        links.append("https://www.wikidata.org/wiki/" + row["Wikidata Id"])
+    return {normalize_url(link): link for link in links}
+
+
+def audit(blocks, rows):
+    """Compare the declared about/mentions entities with the detected ones.
+
+    Args:
+        blocks (list): the parsed JSON-LD blocks of the page.
+        rows (list): the detected entity rows.
+
+    Returns:
+        dict: "blocks", the number of JSON-LD blocks; "types", their @type
+            values; "declared", the declared entities; "missing", detected
+            entities that are not declared; "not_detected", declared entities
+            the analyzer did not find; "duplicated", names declared more than
+            once; "missing_same_as", declared and detected entities whose
+            sameAs lacks links the analyzer found.
+    """
+    declared = declared_entities(blocks)
+    by_name = {}
+    by_link = {}
+    for row in rows:
+        by_name[str(row["name"]).casefold()] = row
+        for link in detected_links(row):
+            by_link[link] = row
+
+    matched = set()
+    not_detected = []
+    missing_same_as = []
+    seen = {}
+    for prop in PROPERTIES:
+        for thing in declared[prop]:
+            key = thing["name"].casefold()
+            seen[key] = seen.get(key, 0) + 1
+            links = set(normalize_url(link) for link in thing["sameAs"])
+            row = by_name.get(key)
+            if row is None:
+                row = next((by_link[link] for link in links if link in by_link), None)
+            if row is None:
+                not_detected.append(dict(thing, property=prop))
+                continue
+            matched.add(row["name"])
+            lacking = [link for norm, link in detected_links(row).items() if norm not in links]
+            if lacking:
+                missing_same_as.append({"name": thing["name"], "property": prop, "links": lacking})
+
+    types = []
+    for block in blocks:
+        for node in _as_list(block.get("@graph", block) if isinstance(block, dict) else block):
+            if isinstance(node, dict):
+                types.extend(str(t) for t in _as_list(node.get("@type")))
+    return {
+        "blocks": len(blocks),
+        "types": types,
+        "declared": declared,
+        "missing": [row["name"] for row in rows if row["name"] not in matched],
+        "not_detected": not_detected,
+        "duplicated": sorted(name for name, count in seen.items() if count > 1 and name),
+        "missing_same_as": missing_same_as,
+    }
@@ -0,0 +1,87 @@
+"""Process-pool execution of the CPU-bound page parsing of the crawler.
+
+HTML parsing (BeautifulSoup/lxml) and JSON-LD extraction hold the GIL, so
+across the crawler worker threads they serialize. With --processes the
+crawler runs parse_page in a process-wide pool of worker processes instead.
+Only bytes and plain strings go in and only tuples, lists and dicts of strings
+come out: soups never cross the process boundary. The Streamlit app parses
+its single page (extract_tags_text, word_frequency) on the script thread.
+
+The pool is created from a multi-threaded process, so its workers are started
+by a fork server (spawned where fork servers are unavailable) rather than
+forked from it. Its size defaults to the number of cores, TES_PROCESSES
+overrides it.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+
+from bs4 import BeautifulSoup
+
+import utils
+
+
+_lock = threading.Lock()
+_pool = None
+
+
+def get_pool():
+    """Get the process-wide worker pool, creating it on first use.
+
+    Returns:
+        ProcessPoolExecutor: the pool.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            workers = int(os.getenv("TES_PROCESSES", "0")) or os.cpu_count()
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["parallel"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return _pool
+
+
+def shutdown():
+    """Stop the worker pool, if it was started."""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def parse_page(url, html):
+    """Parse a page: tags, visible text, same-host links and JSON-LD.
+
+    Args:
+        url (str): the page URL.
+        html (bytes): the page HTML.
+
+    Returns:
+        tuple: the parse_tags tuple, the visible text, the link list and the
+            JSON-LD blocks.
+    """
+    import crawler
+    import markup_audit
+
+    soup = BeautifulSoup(html, "lxml")
+    tags = utils.parse_tags(soup)
+    links = crawler.page_links(url, soup)
+    return tags, crawler.page_text(soup), links, markup_audit.extract_jsonld_blocks(html)
+
+
+def submit(func, *args):
+    """Run one of the functions above in the pool.
+
+    Args:
+        func (callable): a module-level function of this module.
+        *args: its arguments.
+
+    Returns:
+        Future: the pending result.
+    """
+    return get_pool().submit(func, *args)
@@ -0,0 +1,145 @@
+"""Part-of-speech and dependency analysis with spaCy.
+
+One pipeline is loaded per language and process, shared by the parser view
+and the entity extraction of SpacyAnalyzer: each skips the components it does
+not need with the disable argument of ``nlp.pipe``. Long texts are split into sentence-aligned chunks that run
+through ``nlp.pipe`` in batches, instead of being parsed as one giant Doc.
+"""
+import functools
+import re
+import threading
+
+
+SPACY_MODELS = {
+    "en": "en_core_web_sm",
+    "it": "it_core_news_sm",
+}
+
+# Neither the parser view nor the entity extraction uses lemmas, so the
+# lemmatizer is not loaded at all.
+UNLOADED_COMPONENTS = ["lemmatizer"]
+
+# visualize_parser shows token.pos_, which the attribute_ruler (en) or the
+# morphologizer (it) sets, and the dependencies: the entity recognizer is
+# skipped.
+DISABLED_COMPONENTS = ["ner"]
+
+# Entity extraction needs neither the tagger nor the parser.
+NER_DISABLED_COMPONENTS = ["tagger", "parser", "attribute_ruler", "morphologizer", "senter"]
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+_load_lock = threading.Lock()
+
+
+def model_lang(lang):
+    """Map a provider language code to a spaCy model language.
+
+    Args:
+        lang (str): the language returned by the provider (eng, ita, en, it).
+
+    Returns:
+        str: the model language (en, it).
+    """
+    if lang and lang in "ita":
+        return "it"
+    return "en"
+
+
+
+@functools.lru_cache(maxsize=None)
+def _load(name):
+    import spacy
+
+    return spacy.load(name, disable=UNLOADED_COMPONENTS)
+
+
+def load_model(lang):
+    """Get the process-wide spaCy model for a language.
+
+    Args:
+        lang (str): the language returned by the provider.
+
+    Returns:
+        spacy.language.Language: the loaded pipeline, to run with the
+            disable argument of ``nlp.pipe`` (DISABLED_COMPONENTS or
+            NER_DISABLED_COMPONENTS).
+    """
+    with _load_lock:
+        return _load(SPACY_MODELS[model_lang(lang)])
+
+
+def split_sentences(text):
+    """Split text into sentences with a cheap regex, without running a parser.
+
+    Args:
+        text (str): the text to split.
+
+    Returns:
+        list: the non-empty sentences.
+    """
+    return [s.strip() for s in SENTENCE_END.split(text) if s and s.strip()]
+
+
+def chunk_text(text, max_chars=2000):
+    """Group consecutive sentences into chunks of at most max_chars.
+
+    A single sentence longer than max_chars becomes its own chunk.
+
+    Args:
+        text (str): the text to chunk.
+        max_chars (int): the maximum length of a chunk.
+
+    Returns:
+        list: the chunks.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for sentence in split_sentences(text):
+        if current and size + len(sentence) + 1 > max_chars:
+            chunks.append(" ".join(current))
+            current = []
+            size = 0
+        current.append(sentence)
+        size += len(sentence) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def pipe_docs(texts, lang, batch_size=32, n_process=1):
+    """Parse many texts in batches.
+
+    Args:
+        texts (list): the texts to parse.
+        lang (str): the language returned by the provider.
+        batch_size (int): the number of texts per batch.
+        n_process (int): the number of worker processes, -1 for all cores.
+
+    Returns:
+        list: the parsed Docs, in input order.
+    """
+    nlp = load_model(lang)
+    return list(nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=DISABLED_COMPONENTS))
+
+
+def parse_text(text, lang, max_chars=2000, batch_size=32, n_process=1):
+    """Parse a long text chunk by chunk and join the chunks into one Doc.
+
+    Args:
+        text (str): the text to parse.
+        lang (str): the language returned by the provider.
+        max_chars (int): the maximum length of a chunk.
+        batch_size (int): the number of chunks per batch.
+        n_process (int): the number of worker processes, -1 for all cores.
+
+    Returns:
+        spacy.tokens.Doc: the parsed text.
+    """
+    from spacy.tokens import Doc
+
+    docs = pipe_docs(chunk_text(text, max_chars), lang, batch_size, n_process)
+    if not docs:
+        return load_model(lang).make_doc("")
+    return Doc.from_docs(docs)
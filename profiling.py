@@ -0,0 +1,172 @@
+"""On-demand sampling profiler for one analysis run.
+
+Profiling is off unless one of these asks for it:
+
+    ?profile=1                          URL query parameter of the app
+    TES_PROFILE=1                       environment variable
+    streamlit run main.py -- --profile  command line flag
+
+When it is on, a background thread samples the stack of the script thread
+every TES_PROFILE_INTERVAL milliseconds (5) from the submit to the end of the
+run: fetch, provider call, entity table, word frequencies and JSON-LD. The
+samples are written in the collapsed stack format ("frame;frame;frame weight"
+lines) read by flamegraph.pl, speedscope and inferno. Each sample weighs the
+microseconds elapsed since the previous one, since CPU-bound code holding the
+GIL delays the sampler thread. When profiling is off, nothing is started
+and the analysis code is not instrumented at all.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+# Functions whose inclusive time is reported as a stage
+STAGES = collections.OrderedDict([
+    ("fetch", ("load_text_from_url", "get_html", "extract_tags_text")),
+    ("provider call", ("_analyze",)),
+    ("entity table", ("get_df_text_razor", "get_df_google_nlp", "get_df_spacy", "get_df_incremental")),
+    ("word frequency", ("word_frequency",)),
+    ("JSON-LD", ("convert_schema",)),
+])
+
+
+def enabled(query_params=None, argv=None):
+    """Whether profiling was asked for.
+
+    Args:
+        query_params (dict): the app query parameters, name -> list of values.
+        argv (list): the command line, sys.argv if None.
+
+    Returns:
+        bool: True if the query parameter, the environment variable or the
+            command line flag is set.
+    """
+    if os.getenv("TES_PROFILE", "").lower() in TRUE_VALUES:
+        return True
+    if "--profile" in (sys.argv if argv is None else argv)[1:]:
+        return True
+    values = (query_params or {}).get("profile", [])
+    if isinstance(values, str):
+        values = [values]
+    return any(value.lower() in TRUE_VALUES for value in values)
+
+
+class Sampler:
+    def __init__(self, thread_id=None, interval=None):
+        """ Initializes Sampler
+
+        Args:
+            thread_id (int): The thread to sample, the current one if None
+            interval (float): The seconds between two samples,
+                TES_PROFILE_INTERVAL milliseconds if None
+        """
+        self.thread_id = thread_id or threading.get_ident()
+        if interval is None:
+            interval = float(os.getenv("TES_PROFILE_INTERVAL", "5")) / 1000
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.count = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._origin = None
+        self.started = None
+        self.duration = 0.0
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = "{0} ({1}:{2})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        last = self.started
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            stack = []
+            running = self._origin is None
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                if (id(frame), frame.f_code) == self._origin:
+                    running = True
+                frame = frame.f_back
+            if not running:
+                # The profiled code was left without stop(), e.g. by
+                # st.stop() or an exception: the sampler ends on its own.
+                self.duration = now - self.started
+                return
+            self.samples[";".join(reversed(stack))] += int((now - last) * 1e6)
+            self.count += 1
+            last = now
+
+    def start(self):
+        """ Starts sampling
+
+        Sampling ends with stop(), or on its own once the caller's frame has
+        returned or raised, so an aborted run does not leave it running.
+
+        Returns:
+            Sampler: self
+        """
+        if self.thread_id == threading.get_ident():
+            caller = sys._getframe(1)
+            self._origin = (id(caller), caller.f_code)
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="tes-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops sampling
+
+        Returns:
+            Sampler: self
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.duration = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self):
+        """ The samples in the collapsed stack format
+
+        Returns:
+            str: one "frame;frame;frame microseconds" line per distinct stack
+        """
+        return "\n".join("{0} {1}".format(stack, count) for stack, count in sorted(self.samples.items())) + "\n"
+
+    def stage_times(self):
+        """ The estimated inclusive time of each stage of STAGES
+
+        Returns:
+            dict: stage name -> seconds
+        """
+        times = collections.OrderedDict((stage, 0.0) for stage in STAGES)
+        for stack, weight in self.samples.items():
+            names = set(frame.split(" (", 1)[0] for frame in stack.split(";"))
+            for stage, functions in STAGES.items():
+                if names.intersection(functions):
+                    times[stage] += weight / 1e6
+        return times
+
+    def report(self):
+        """ The profile of the run
+
+        Returns:
+            dict: "collapsed", the collapsed stacks; "stages", the stage
+                times; "duration", the profiled wall time in seconds;
+                "samples", the sample count
+        """
+        return {
+            "collapsed": self.collapsed(),
+            "stages": self.stage_times(),
+            "duration": self.duration,
+            "samples": self.count,
+        }
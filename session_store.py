@@ -0,0 +1,251 @@
+"""Memory-bounded store for per-session analysis results.
+
+Every connected session keeps its entity tables and the analyzed text between
+reruns. Kept in st.session_state, they grow with the number of sessions until
+the server runs out of memory. This store keeps them in one process-wide LRU
+instead, under a global memory budget: when the budget is exceeded, the least
+recently used results are pickled, compressed and spilled to disk, and they
+are loaded back transparently the next time their session reads them.
+
+    TES_SESSION_BUDGET_MB   in-memory budget, all sessions together (256)
+    TES_SESSION_SPILL_DIR   where spilled results go (a temporary directory)
+    TES_SESSION_TTL         seconds after which idle sessions are dropped (86400)
+"""
+import collections
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+
+def estimate_size(value):
+    """Estimate the memory footprint of a result.
+
+    Args:
+        value: a DataFrame, a string or any picklable object.
+
+    Returns:
+        int: the size in bytes.
+    """
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class SessionStore:
+    def __init__(self, budget_bytes, spill_dir=None, ttl=86400):
+        """ Initializes SessionStore
+
+        Args:
+            budget_bytes (int): The in-memory budget for all sessions together
+            spill_dir (str): The directory for spilled results, a temporary
+                directory if None
+            ttl (float): The seconds after which an idle session is dropped
+        """
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="tes-sessions-")
+        self.ttl = ttl
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._memory = collections.OrderedDict()
+        self._disk = {}
+        self._last_seen = {}
+        self.memory_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, "{0}-{1}.pkl.z".format(*key))
+
+    def _touch(self, session_id):
+        now = time.time()
+        self._last_seen[session_id] = now
+        for session, seen in list(self._last_seen.items()):
+            if now - seen > self.ttl:
+                self.drop_session(session)
+
+    def _spill(self, keep):
+        while self.memory_bytes > self.budget_bytes:
+            key = next((k for k in self._memory if k != keep), None)
+            if key is None:
+                return
+            value, size = self._memory.pop(key)
+            data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+            with open(self._path(key), "wb") as f:
+                f.write(data)
+            self._disk[key] = (size, len(data))
+            self.memory_bytes -= size
+
+    def put(self, session_id, name, value):
+        """ Stores a result of a session
+
+        Args:
+            session_id (str): The session id
+            name (str): The result name
+            value: The result, it must be picklable
+        """
+        key = (session_id, name)
+        with self._lock:
+            self._touch(session_id)
+            self._discard(key)
+            size = estimate_size(value)
+            self._memory[key] = (value, size)
+            self.memory_bytes += size
+            self._spill(keep=key)
+
+    def get(self, session_id, name, default=None):
+        """ Gets a result of a session, loading it back from disk if spilled
+
+        Args:
+            session_id (str): The session id
+            name (str): The result name
+            default: Returned if the result is not stored
+
+        Returns:
+            The result
+        """
+        key = (session_id, name)
+        with self._lock:
+            self._touch(session_id)
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key][0]
+            if key not in self._disk:
+                return default
+            size, _ = self._disk.pop(key)
+            path = self._path(key)
+            with open(path, "rb") as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+            os.remove(path)
+            self._memory[key] = (value, size)
+            self.memory_bytes += size
+            self._spill(keep=key)
+            return value
+
+    def contains(self, session_id, name):
+        """ Whether a result of a session is stored, in memory or on disk """
+        key = (session_id, name)
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def _discard(self, key):
+        if key in self._memory:
+            self.memory_bytes -= self._memory.pop(key)[1]
+        if key in self._disk:
+            self._disk.pop(key)
+            os.remove(self._path(key))
+
+    def delete(self, session_id, name):
+        """ Deletes a result of a session """
+        with self._lock:
+            self._discard((session_id, name))
+
+    def drop_session(self, session_id):
+        """ Deletes every result of a session """
+        with self._lock:
+            for key in [k for k in list(self._memory) + list(self._disk) if k[0] == session_id]:
+                self._discard(key)
+            self._last_seen.pop(session_id, None)
+
+    def footprint(self):
+        """ Reports the memory and disk footprint of each session
+
+        Returns:
+            dict: "sessions", session id -> {"memory", "disk", "spilled"}
+                (bytes, bytes, spilled result count); and the "memory",
+                "disk" and "budget" totals in bytes
+        """
+        with self._lock:
+            sessions = {}
+            for (session_id, name), (value, size) in self._memory.items():
+                usage = sessions.setdefault(session_id, {"memory": 0, "disk": 0, "spilled": 0})
+                usage["memory"] += size
+            for (session_id, name), (size, disk) in self._disk.items():
+                usage = sessions.setdefault(session_id, {"memory": 0, "disk": 0, "spilled": 0})
+                usage["disk"] += disk
+                usage["spilled"] += 1
+            return {
+                "sessions": sessions,
+                "memory": self.memory_bytes,
+                "disk": sum(disk for size, disk in self._disk.values()),
+                "budget": self.budget_bytes,
+            }
+
+    def close(self):
+        """ Deletes every result and the spill directory """
+        with self._lock:
+            self._memory.clear()
+            self._disk.clear()
+            self.memory_bytes = 0
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+class SessionResults:
+    def __init__(self, store, session_id):
+        """ The results of one session, with a dict-like interface
+
+        Args:
+            store (SessionStore): The process-wide store
+            session_id (str): The session id
+        """
+        self.store = store
+        self.session_id = session_id
+
+    def __contains__(self, name):
+        return self.store.contains(self.session_id, name)
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return self.store.get(self.session_id, name)
+
+    def __setitem__(self, name, value):
+        self.store.put(self.session_id, name, value)
+
+    def get(self, name, default=None):
+        return self.store.get(self.session_id, name, default)
+
+    def pop(self, name, default=None):
+        value = self.store.get(self.session_id, name, default)
+        self.store.delete(self.session_id, name)
+        return value
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Get the process-wide store, configured from the environment.
+
+    Returns:
+        SessionStore: the store.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(
+                int(float(os.getenv("TES_SESSION_BUDGET_MB", "256")) * 1024 * 1024),
+                os.getenv("TES_SESSION_SPILL_DIR"),
+                float(os.getenv("TES_SESSION_TTL", "86400")),
+            )
+    return _store
+
+
+def session_results(session_state):
+    """Get the results of the current session.
+
+    Args:
+        session_state: st.session_state, where the session id is kept.
+
+    Returns:
+        SessionResults: the results of the session.
+    """
+    if "session_id" not in session_state:
+        session_state.session_id = uuid.uuid4().hex
+    return SessionResults(get_store(), session_state.session_id)
@@ -0,0 +1,93 @@
+"""Coalescing of identical in-flight calls.
+
+When several sessions or crawler workers ask for the same analysis, page or
+Wikipedia summary at the same time, only the first caller (the leader) makes
+the call: the others wait for it and receive its result, or its exception.
+Nothing is kept once the call returns, so this is not a cache; it only
+removes the duplicate calls of a burst.
+"""
+import hashlib
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    def __init__(self):
+        """ Initializes Group, a set of keyed in-flight calls """
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """ Calls func, unless a call with the same key is in flight
+
+        Args:
+            key: A hashable key, equal for calls that are interchangeable
+            func (callable): The function to call
+            *args: Its arguments
+            **kwargs: Its keyword arguments
+
+        Returns:
+            The result of func, from this call or from the in-flight one
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """ The number of calls in flight """
+        with self._lock:
+            return len(self._calls)
+
+
+def content_hash(value):
+    """Hash a text or a JSON-like value for use in a key.
+
+    Args:
+        value: a string, bytes, or a dict/list of them (e.g. credentials).
+
+    Returns:
+        str: the hex digest.
+    """
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    elif not isinstance(value, bytes):
+        value = repr(sorted(value.items()) if isinstance(value, dict) else value).encode("utf-8")
+    return hashlib.sha256(value).hexdigest()
+
+
+# The process-wide groups, one per kind of call
+analyses = Group()
+pages = Group()
+summaries = Group()
@@ -1,4 +1,6 @@
 import base64
+import collections
+import functools
 import os
 import json
 import pickle
@@ -7,21 +9,14 @@ import re
 import simplejson
 import unidecode
 
-import wikipediaapi
-from textrazor import TextRazorAnalysisException
-from analyzer import TextRazorAnalyzer, GoogleNLPAnalyzer
+from analyzer import TextRazorAnalyzer, GoogleNLPAnalyzer, SpacyAnalyzer
+import singleflight
 import validators
-import extruct
 from bs4 import BeautifulSoup
-from w3lib.html import get_base_url
-from dateutil import parser
 import streamlit as st
 import pandas as pd
 import requests
 
-en_wiki_wiki = wikipediaapi.Wikipedia('en')
-it_wiki_wiki = wikipediaapi.Wikipedia('it')
-
 
 google_types = {
     0 :"UNKNOWN",
@@ -40,9 +35,170 @@ google_types = {
 }
 
 
+@functools.lru_cache(maxsize=None)
+def get_wiki_client(lang):
+    """Get the process-wide Wikipedia client for a language.
+
+    Args:
+        lang (str): the Wikipedia language code (en, it).
+
+    Returns:
+        wikipediaapi.Wikipedia: the Wikipedia client.
+    """
+    import wikipediaapi
+
+    return wikipediaapi.Wikipedia(lang)
+
+
+@functools.lru_cache(maxsize=None)
+def get_stemmer(language):
+    """Get the process-wide Snowball stemmer for a language.
+
+    Args:
+        language (str): the NLTK language name (english, italian).
+
+    Returns:
+        SnowballStemmer: the stemmer.
+    """
+    from nltk.stem.snowball import SnowballStemmer
+
+    return SnowballStemmer(language=language)
+
+spacy_types = {
+    "PERSON": "PERSON",
+    "PER": "PERSON",
+    "ORG": "ORGANIZATION",
+    "GPE": "LOCATION",
+    "LOC": "LOCATION",
+    "FAC": "LOCATION",
+    "EVENT": "EVENT",
+    "WORK_OF_ART": "WORK_OF_ART",
+    "PRODUCT": "CONSUMER_GOOD",
+    "NORP": "OTHER",
+    "LAW": "OTHER",
+    "LANGUAGE": "OTHER",
+    "MISC": "OTHER",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_local_index(lang):
+    """Get the local Wikipedia/Wikidata index for a language, if one was built.
+
+    The index files are looked up as wiki-<lang>.idx in the directory set by
+    the TES_WIKI_INDEX_DIR environment variable.
+
+    Args:
+        lang (str): the Wikipedia language code (en, it).
+
+    Returns:
+        WikiIndex: the memory-mapped index, or None.
+    """
+    index_dir = os.getenv("TES_WIKI_INDEX_DIR")
+    if not index_dir:
+        return None
+    path = os.path.join(index_dir, "wiki-{0}.idx".format(lang))
+    if not os.path.exists(path):
+        return None
+    import wiki_index
+
+    return wiki_index.WikiIndex(path)
+
+
+def get_local_summary_link(title, lang):
+    """Get summary and links from the local index, without any network call.
+
+    Args:
+        title (str): the title of the article.
+        lang (str): the language of the article.
+
+    Returns:
+        tuple: summary, en link and it link, or None if not in the index.
+    """
+    wiki_lang = "it" if lang in "ita" else "en"
+    index = get_local_index(wiki_lang)
+    if index is None:
+        return None
+    record = index.lookup_title(title)
+    if record is None or not record.summary:
+        return None
+    import wiki_index
+
+    return (
+        record.summary,
+        wiki_index.page_url("en", record.en_title if wiki_lang == "it" else record.title),
+        wiki_index.page_url("it", record.it_title if wiki_lang == "en" else record.title),
+    )
+
+
+def get_local_same_as(d, lang):
+    """Resolve the sameAs links of an entity row from the local index.
+
+    Args:
+        d (dict): the entity row (name, Wikidata Id, Knowledge Graph ID...).
+        lang (str): the language of the data.
+
+    Returns:
+        list: the Wikipedia and Wikidata URLs, empty if not in the index.
+    """
+    wiki_lang = "it" if lang in "ita" else "en"
+    index = get_local_index(wiki_lang)
+    if index is None:
+        return []
+    record = None
+    if d.get("Wikidata Id"):
+        record = index.lookup_wikidata(d["Wikidata Id"])
+    if record is None and d.get("Knowledge Graph ID"):
+        record = index.lookup_mid(d["Knowledge Graph ID"])
+    if record is None:
+        record = index.lookup_title(d["name"])
+    if record is None:
+        return []
+    import wiki_index
+
+    same_as = [wiki_index.page_url(wiki_lang, record.title)]
+    if record.wikidata_id:
+        same_as.append("https://www.wikidata.org/wiki/" + record.wikidata_id)
+    return same_as
+
+
+def count_frequencies(text, names, language_option):
+    """Count how many times each entity name occurs in a text.
+
+    A name that never occurs verbatim is counted by its Snowball stem among
+    the stems of the text tokens.
+
+    Args:
+        text (str): the analyzed text.
+        names (list): the entity names.
+        language_option (str): the language of the text (eng, ita).
+
+    Returns:
+        list: the count of each name.
+    """
+    if language_option == 'eng':
+        stemmer = get_stemmer('english')
+    else:
+        stemmer = get_stemmer('italian')
+
+    stem_words = collections.Counter(stemmer.stem(token) for token in text.split())
+    word_count = []
+    txt = text.lower()
+    for word in names:
+        word = word.lower()
+        count = txt.count(word)
+        if count == 0:
+            count = stem_words[stemmer.stem(word)]
+        word_count.append(count)
+    return word_count
+
+
 def get_summary_link(title, lang):
     """Get summary from Wikipedia.
 
+    The local index (see get_local_index) is used when it knows the title.
+    Concurrent lookups of the same title share one Wikipedia request.
+
     Args:
         title (str): the title of the article.
         lang (str): the language of the article.
@@ -51,11 +207,25 @@ def get_summary_link(title, lang):
         str: the summary of the article.
         str: the link of the article.
     """
+    local = get_local_summary_link(title, lang)
+    if local is not None:
+        return local
+    wiki_lang = "it" if lang in "ita" else "en"
+    return singleflight.summaries.do((wiki_lang, title), fetch_summary_link, title, wiki_lang)
+
+
+def fetch_summary_link(title, wiki_lang):
+    """Get summary from Wikipedia, without the local index.
+
+    Args:
+        title (str): the title of the article.
+        wiki_lang (str): the Wikipedia language code (en, it).
+
+    Returns:
+        tuple: as get_summary_link.
+    """
     try:
-        if lang in "ita":
-            wiki_wiki = it_wiki_wiki
-        else:
-            wiki_wiki = en_wiki_wiki
+        wiki_wiki = get_wiki_client(wiki_lang)
         
         page = wiki_wiki.page(title)
 
@@ -64,7 +234,7 @@ def get_summary_link(title, lang):
         summary = summary.replace("\n", " ").replace(",", " ").replace("  ", " ")
         summary = unidecode.unidecode(summary)
 
-        if lang in "ita":
+        if wiki_lang == "it":
             try:
                 en_link = page.langlinks["en"].fullurl
                 it_link = page.fullurl
@@ -84,41 +254,23 @@ def get_summary_link(title, lang):
 
 
 def convert_schema(schema_type, data, scrape_all, lang):
-    """Convert the dataframe to the schema.
+    """Convert the entities to the schema.
 
     Args:
         schema_type (str): name of the schema, can be (about, mentions).
-        data (str): the data to be converted.
+        data (list or str): the jsonld.EntityRecord list to be converted, or
+            a JSON array of entity rows.
         scrape_all (boolean): if True, all the data will be scraped.
         lang (str): the language of the data.
 
     Returns:
         str: the converted data.
     """
-    header = '<script type="application/ld+json">\n'
-    footer = "\n</script>"
-    data = json.loads(data)
-    result = []
-    for d in data:
-        item = {}
-        
-        item["@context"] = "http://schema.org"
-        item["@type"] = "Thing"
-        item["name"] = d["name"]
-        if not scrape_all:
-            item["description"] = get_summary_link(d["name"], lang)[0]
-        
-        if "Wikidata Id" in d and "Wikipedia Link" in d:
-            item["SameAs"] = [
-                d.pop("Wikipedia Link", None),
-                "https://www.wikidata.org/wiki/" + d.pop("Wikidata Id", None)
-            ]
-        elif "Wikipedia Link" in d:
-            item["SameAs"] = [
-                d.pop("Wikipedia Link", None)
-            ]
-        result.append(item)
-    return header + json.dumps([{f"{schema_type}": result}], indent=4 * ' ') + footer
+    import jsonld
+
+    if isinstance(data, str):
+        data = [jsonld.from_row(d) for d in json.loads(data)]
+    return jsonld.render(schema_type, data, scrape_all, lang)
 
 
 def extract_tags_text(url):
@@ -136,8 +288,23 @@ def extract_tags_text(url):
     """
     headers = {'User-Agent': 'My User Agent 1.0'}
     html_content = requests.get(url, headers=headers).text
-    soup = BeautifulSoup(html_content, "lxml")
-    title = soup.title.text
+    return parse_tags(html_content)
+
+
+def parse_tags(html_content):
+    """Extract the tags from the HTML of a page.
+
+    Args:
+        html_content (str): the HTML of the page, or its BeautifulSoup.
+
+    Returns:
+        tuple: title, description, h1, h2 and h3 texts, as extract_tags_text.
+    """
+    if isinstance(html_content, BeautifulSoup):
+        soup = html_content
+    else:
+        soup = BeautifulSoup(html_content, "lxml")
+    title = soup.title.text if soup.title else ""
     desc = soup.find("meta", attrs={"name": "description"})
     if desc:
         desc = desc.get("content", "")
@@ -161,6 +328,8 @@ def is_url(text):
 def is_time(text):
     """Check if a string is a valid time.
     """
+    from dateutil import parser
+
     try:
         parser.parse(text)
         return True
@@ -273,46 +442,81 @@ def scrape(url):
 
 def get_metadata(html, url):
     """Fetch JSON-LD structured data."""
-    metadata = extruct.extract(
-        html,
-        base_url=get_base_url(html, url),
-        syntaxes=['json-ld'],
-    )['json-ld']
+    import markup_audit
+
+    metadata = markup_audit.extract_jsonld_blocks(html)
     if bool(metadata) and isinstance(metadata, list):
         metadata = metadata[0]
     return metadata
 
 
-def get_df_text_razor(text_razor_key, text_input, extract_categories_topics, is_url, scrape_all):
-    #x = True
-    """ Get data using TextRazor API.
+def get_jsonld_blocks(url):
+    """Fetch every JSON-LD block of a page."""
+    import markup_audit
+
+    return markup_audit.extract_jsonld_blocks(get_html(url))
+
+
+def show_markup_audit(blocks, df):
+    """ Render the audit of the JSON-LD markup already on the page.
 
     Args:
-        text_razor_key (str): TextRazor API key.
-        text_input (str): Text to analyze.
-        extract_categories_topics (boolean): If True, extract categories and topics.
-        is_url (bool): If True, text_input is a URL.
+        blocks (list): The JSON-LD blocks of the page.
+        df (DataFrame): The detected entities.
+    """
+    import markup_audit
+
+    report = markup_audit.audit(blocks, df.to_dict("records"))
+    st.write('### Existing JSON-LD markup')
+    if not report["blocks"]:
+        st.info("No JSON-LD markup found on the page.")
+        return
+    st.write(f"{report['blocks']} JSON-LD blocks: " + ", ".join(report["types"]))
+    declared = [dict(thing, property=prop) for prop, things in report["declared"].items() for thing in things]
+    if declared:
+        st.write('#### Declared about/mentions entities', pd.DataFrame(declared))
+    else:
+        st.warning("The markup declares no 'about' or 'mentions' entities.")
+    if report["missing"]:
+        st.write('#### Detected entities missing from the markup', pd.DataFrame({"name": report["missing"]}))
+    if report["not_detected"]:
+        st.write('#### Declared entities not detected in the content', pd.DataFrame(report["not_detected"]))
+    if report["duplicated"]:
+        st.write('#### Entities declared more than once', ", ".join(report["duplicated"]))
+    if report["missing_same_as"]:
+        st.write('#### sameAs links to add', pd.DataFrame(report["missing_same_as"]))
+
+
+def show_profile(report):
+    """ Render the profile of the last analysis run.
+
+    Args:
+        report (dict): The profiling.Sampler report.
+    """
+    st.write(f"{report['duration']:.2f} s profiled, {report['samples']} samples")
+    st.write(pd.DataFrame({
+        "stage": list(report["stages"]),
+        "seconds": [round(s, 3) for s in report["stages"].values()],
+    }))
+    st.markdown(download_button(report["collapsed"], 'profile.folded', 'Download the profile (collapsed stacks) ✨', pickle_it=False), unsafe_allow_html=True)
+    st.caption("Open it with speedscope.app or flamegraph.pl.")
+
+
+def text_razor_rows(response, scrape_all, progress=None):
+    """ Build the entity rows of a TextRazor response.
+
+    Args:
+        response (TextRazorResponse): TextRazor response object.
         scrape_all (boolean): If True, scrape all data.
+        progress (callable): Called with the fraction of entities processed.
 
     Returns:
         output (list): List of dictionaries containing extracted data.
-        response (TextRazorResponse): TextRazor response object.
-        topics_output (list): List of dictionaries containing extracted topics.
-        categories_output (list): List of dictionaries containing extracted categories.
     """
-    progress_val = 0
-    progress_bar = st.progress(progress_val)
-    try:
-        analyzer = TextRazorAnalyzer(text_razor_key)
-        response = analyzer.analyze(text_input, is_url)
-    except TextRazorAnalysisException:
-        st.warning("Please make sure that the API Key is correct")
-        st.stop()
-    
     output = []
     known_entities = []
-    for i, entity in enumerate(response.entities()):
-        progress_val += 1
+    entities = response.entities()
+    for i, entity in enumerate(entities):
         if entity.id not in known_entities and\
         entity.confidence_score > 0 and\
         entity.relevance_score > 0 and\
@@ -343,24 +547,75 @@ def get_df_text_razor(text_razor_key, text_input, extract_categories_topics, is_
                 del data["English Wikipedia Link"]
             output.append(data)
             known_entities.append(entity.id)
-        progress_bar.progress((progress_val)/len(response.entities()))
+        if progress:
+            progress((i + 1)/len(entities))
+    return output
+
+
+def text_razor_topics_categories(response):
+    """ Build the topic and category rows of a TextRazor response.
+
+    Args:
+        response (TextRazorResponse): TextRazor response object.
+
+    Returns:
+        topics_output (list): List of dictionaries containing extracted topics.
+        categories_output (list): List of dictionaries containing extracted categories,
+            with the full IPTC path and id for iptc.py.
+    """
+    topics_output = []
+    categories_output = []
+    for i, topic in enumerate(response.topics()):
+        topics_output.append(
+            {
+                "label": topic.label,
+                "score": topic.score
+            }
+        )
+    for i, category in enumerate(response.categories()):
+        categories_output.append(
+            {
+                "label": category.label.split(">")[-1],
+                "score": category.score,
+                "path": category.label,
+                "id": category.category_id
+            }
+        )
+    return topics_output, categories_output
+
+
+def get_df_text_razor(text_razor_key, text_input, extract_categories_topics, is_url, scrape_all):
+    #x = True
+    """ Get data using TextRazor API.
+
+    Args:
+        text_razor_key (str): TextRazor API key.
+        text_input (str): Text to analyze.
+        extract_categories_topics (boolean): If True, extract categories and topics.
+        is_url (bool): If True, text_input is a URL.
+        scrape_all (boolean): If True, scrape all data.
+
+    Returns:
+        output (list): List of dictionaries containing extracted data.
+        response (TextRazorResponse): TextRazor response object.
+        topics_output (list): List of dictionaries containing extracted topics.
+        categories_output (list): List of dictionaries containing extracted categories.
+    """
+    from textrazor import TextRazorAnalysisException
+
+    progress_bar = st.progress(0)
+    try:
+        analyzer = TextRazorAnalyzer(text_razor_key)
+        response = analyzer.analyze(text_input, is_url)
+    except TextRazorAnalysisException:
+        st.warning("Please make sure that the API Key is correct")
+        st.stop()
+
+    output = text_razor_rows(response, scrape_all, progress_bar.progress)
     topics_output = []
     categories_output = []
     if extract_categories_topics:
-        for i, topic in enumerate(response.topics()):
-            topics_output.append(
-                {
-                    "label": topic.label,
-                    "score": topic.score
-                }
-            )
-        for i, category in enumerate(response.categories()):
-            categories_output.append(
-                {
-                    "label": category.label.split(">")[-1],
-                    "score": category.score
-                }
-            )
+        topics_output, categories_output = text_razor_topics_categories(response)
     return output, response, topics_output, categories_output
 
 #----------------------------Convert Confidence score value into percentage----------------------
@@ -371,6 +626,86 @@ def conf(df, col):
  #-------------------------------------end----------------------------------------------
 
 
+def sort_entities(df, col):
+    """ Sort an entity table by a percentage column, highest first.
+
+    The stored table is left untouched, so it can be sorted again on the
+    next rerun.
+
+    Args:
+        df (DataFrame): The entity table.
+        col (str): The percentage column (Relevance Score, Salience).
+
+    Returns:
+        DataFrame: The sorted table.
+    """
+    df = df.assign(temp=df[col].str.strip('%').astype(float))
+    return df.sort_values('temp', ascending=False).drop(columns='temp')
+
+
+def add_frequency(df, text, language):
+    """ Insert the Frequency column of an entity table, in place.
+
+    Args:
+        df (DataFrame): The entity table.
+        text (str): The analyzed text.
+        language (str): The language of the text (eng, ita).
+    """
+    df.insert(loc=3, column='Frequency', value=count_frequencies(text, list(df['name']), language))
+
+
+def google_nlp_rows(response, scrape_all, progress=None):
+    """ Build the entity rows of a Google Natural Language API response.
+
+    Args:
+        response (GoogleNLPResponse): Google Natural Language API response object.
+        scrape_all (boolean): If True, scrape all data.
+        progress (callable): Called with the fraction of entities processed.
+
+    Returns:
+        output (list): List of dictionaries containing extracted data.
+    """
+    output = []
+    known_entities = []
+    for i, entity in enumerate(response.entities):
+        if progress:
+            progress((i + 1)/len(response.entities))
+        if entity.name not in known_entities and\
+        not str(entity.name).isnumeric() and not is_time(entity.name):
+            summary = ""
+            en_link = ""
+            it_link = ""
+            if scrape_all:#or x:
+                summary, en_link, it_link = get_summary_link(entity.name, response.language)
+
+            if entity.metadata.get("mid"):
+                mid = "https://www.google.com/search?kgmid=" + entity.metadata.get("mid")
+            else:
+                mid = ""
+            if entity.type_:
+                row_type = google_types[entity.type_]
+                if row_type in ["NUMBER", "PRICE", "DATE"]:
+                    continue
+            else:
+                row_type = "thing"
+            data = {
+                "type": row_type,
+                "name": unidecode.unidecode(entity.name),
+                "description": summary,
+                "Salience": f"{entity.salience * 100:.2f}%",
+                "Knowledge Graph ID": mid,
+                "Italian Wikipedia Link": it_link,
+                "English Wikipedia Link": en_link,
+            }
+            if not scrape_all:
+                del data["description"]
+                del data["English Wikipedia Link"]
+                del data["Italian Wikipedia Link"]
+            output.append(data)
+            known_entities.append(entity.name)
+    return output
+
+
 def get_df_google_nlp(key, text_input, is_url, scrape_all):
     #x = True
    # scrape_all= True
@@ -386,8 +721,7 @@ def get_df_google_nlp(key, text_input, is_url, scrape_all):
         output (list): List of dictionaries containing extracted data.
         response (GoogleNLPResponse): Google Natural Language API response object.
     """
-    progress_val = 0
-    progress_bar = st.progress(progress_val)
+    progress_bar = st.progress(0)
     try:
         analyzer = GoogleNLPAnalyzer(key)
         response = analyzer.analyze(text_input, is_url)
@@ -398,53 +732,163 @@ def get_df_google_nlp(key, text_input, is_url, scrape_all):
         print(e)
         st.warning("Please make sure that the API Key is correct")
         st.stop()
-    
+
+    output = google_nlp_rows(response, scrape_all, progress_bar.progress)
+    return output, response
+
+
+def get_df_incremental(provider, key, text_input, is_url, scrape_all, document_id=None):
+    """ Get data re-analyzing only the paragraphs changed since the last run.
+
+    When scrape_all is False the Wikipedia columns are left out, as in
+    get_df_text_razor; main.py fills them in the background (enrichment.py).
+
+    Args:
+        provider (str): Provider name (TextRazor, Google NLP).
+        key: TextRazor API key or Google Natural Language API key.
+        text_input (str): Text to analyze.
+        is_url (boolean): If True, text_input is a URL.
+        scrape_all (boolean): If True, scrape all data.
+        document_id (str): Key of the stored results, the URL if None. Texts
+            need one, e.g. the session id, so drafts are not shared.
+
+    Returns:
+        output (list): List of dictionaries containing extracted data.
+        text (str): The analyzed text.
+        language (str): The language of the text.
+    """
+    import incremental
+
+    try:
+        output, text, language, report = incremental.analyze(provider, key, text_input, is_url, document_id)
+    except Exception as e:
+        print(e)
+        st.warning("Please make sure that the API Key is correct")
+        st.stop()
+    if not report["paragraphs"]:
+        st.warning("Please make sure that the URL is reachable")
+        st.stop()
+
+    if scrape_all:
+        progress_bar = st.progress(0)
+        for i, data in enumerate(output):
+            summary, en_link, it_link = get_summary_link(data["name"], language)
+            data["description"] = summary
+            data["English Wikipedia Link"] = en_link
+            if provider == "Google NLP":
+                data["Italian Wikipedia Link"] = it_link
+            progress_bar.progress((i + 1)/len(output))
+
+    st.info(
+        f"{report['analyzed']} of {report['paragraphs']} paragraphs analyzed, "
+        f"{report['unchanged']} unchanged, {report['removed']} removed since the last run."
+    )
+    if report["added_entities"]:
+        st.write("New entities:", ", ".join(report["added_entities"]))
+    if report["removed_entities"]:
+        st.write("Removed entities:", ", ".join(report["removed_entities"]))
+    return output, text, language
+
+
+def show_pos(text, lang):
+    """ Render the Part-of-Speech and dependency analysis of a text.
+
+    Args:
+        text (str): Text (or URL, for Google NLP) to analyze.
+        lang (str): Language returned by the provider.
+    """
+    from spacy_streamlit import visualize_parser
+
+    with st.spinner("Parsing the text with SpaCy..."):
+        doc = parse_pos(text, lang)
+    visualize_parser(doc)
+
+
+@functools.lru_cache(maxsize=8)
+def parse_pos(text, lang):
+    """ Parse a text with SpaCy, once per text and language in the process.
+
+    Streamlit re-runs the script on every interaction: the last parses are
+    kept so that the parser view of unchanged results is not parsed again.
+
+    Args:
+        text (str): Text (or URL) to parse.
+        lang (str): Language returned by the provider.
+
+    Returns:
+        spacy.tokens.Doc: The parsed text.
+    """
+    import crawler
+    import pos
+
+    if is_url(text):
+        text = crawler.page_text(BeautifulSoup(get_html(text), "lxml"))
+    n_process = int(os.getenv("TES_POS_PROCESSES", "1"))
+    return pos.parse_text(text, lang, n_process=n_process)
+
+
+def spacy_rows(response, scrape_all, progress=None):
+    """ Build the entity rows of a SpaCy response.
+
+    Args:
+        response (SpacyResponse): SpaCy response object.
+        scrape_all (boolean): If True, scrape all data.
+        progress (callable): Called with the fraction of entities processed.
+
+    Returns:
+        output (list): List of dictionaries containing extracted data.
+    """
     output = []
-    known_entities = []
     for i, entity in enumerate(response.entities):
-        progress_val += 1
-        if entity.name not in known_entities and\
-        not str(entity.name).isnumeric() and not is_time(entity.name):
+        if progress:
+            progress((i + 1)/len(response.entities))
+        row_type = spacy_types.get(entity.label)
+        if row_type and not str(entity.name).isnumeric() and not is_time(entity.name):
             summary = ""
             en_link = ""
             it_link = ""
-            if scrape_all:#or x:
+            if scrape_all:
                 summary, en_link, it_link = get_summary_link(entity.name, response.language)
-                lang = response.language
-
-            if entity.metadata.get("mid"):
-                mid = "https://www.google.com/search?kgmid=" + entity.metadata.get("mid")
-            else:
-                mid = ""
-            if entity.type_:
-                row_type = google_types[entity.type_]
-                if row_type in ["NUMBER", "PRICE", "DATE"]:
-                    continue
-            else:
-                row_type = "thing"
             data = {
                 "type": row_type,
                 "name": unidecode.unidecode(entity.name),
                 "description": summary,
                 "Salience": f"{entity.salience * 100:.2f}%",
-                "Knowledge Graph ID": mid,
                 "Italian Wikipedia Link": it_link,
                 "English Wikipedia Link": en_link,
             }
-            #print('\nLanguage\n', response.language)
             if not scrape_all:
                 del data["description"]
                 del data["English Wikipedia Link"]
                 del data["Italian Wikipedia Link"]
-            # if not scrape_all and lang == "it":
-            #     del data["English Wikipedia Link"]
-            # if  lang == "en":
-            #     del data["Italian Wikipedia Link"]
             output.append(data)
-            known_entities.append(entity.name)
-        progress_bar.progress((progress_val)/len(response.entities))
+    return output
+
+
+def get_df_spacy(lang, text_input, is_url, scrape_all):
+    """ Get data using the local spaCy models, without any API call.
+
+    Args:
+        lang (str): Language of the text (eng, ita).
+        text_input (str): Text to analyze.
+        is_url (boolean): If True, text_input is a URL.
+        scrape_all (boolean): If True, scrape all data.
+
+    Returns:
+        output (list): List of dictionaries containing extracted data.
+        response (SpacyResponse): SpaCy response object.
+    """
+    progress_bar = st.progress(0)
+    analyzer = SpacyAnalyzer(lang)
+    response = analyzer.analyze(text_input, is_url)
+    if not response:
+        st.warning("Please make sure that the URL is reachable")
+        st.stop()
+
+    output = spacy_rows(response, scrape_all, progress_bar.progress)
     return output, response
 
+
 def write_meta(text_input, meta_tags_only, is_url):
     """ Concatenate meta tags with input text.
 
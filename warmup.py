@@ -0,0 +1,118 @@
+"""Background warm-up of process-wide resources.
+
+Streamlit re-runs main.py on every interaction, but imported modules live for
+the whole server process. Heavy dependencies are imported lazily by the code
+that needs them; this module pre-loads them once, in a daemon thread, so the
+first request does not pay for them either.
+
+Run ``python warmup.py`` to print the import time of every heavy dependency.
+"""
+import importlib
+import os
+import threading
+import time
+
+
+HEAVY_MODULES = [
+    "textrazor",
+    "google.cloud.language_v1",
+    "wikipediaapi",
+    "dateutil.parser",
+    "nltk.stem.snowball",
+    "lxml.html",
+]
+
+import_times = {}
+warmup_times = {}
+
+_lock = threading.Lock()
+_thread = None
+
+
+def timed_import(name):
+    """Import a module and record how long the first import took.
+
+    Args:
+        name (str): the dotted name of the module.
+
+    Returns:
+        module: the imported module.
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def _timed(name, func, *args):
+    start = time.perf_counter()
+    try:
+        func(*args)
+    except Exception as e:
+        print("Warm-up of {0} failed: {1}".format(name, e))
+    warmup_times[name] = time.perf_counter() - start
+
+
+def warm_up(spacy_models=False):
+    """Load heavy modules and build the process-wide resources.
+
+    Args:
+        spacy_models (bool): If True, also load the spaCy models.
+    """
+    import utils
+
+    for name in HEAVY_MODULES:
+        _timed(name, timed_import, name)
+    for language in ("english", "italian"):
+        _timed("stemmer:" + language, utils.get_stemmer, language)
+    for lang in ("en", "it"):
+        _timed("wikipedia:" + lang, utils.get_wiki_client, lang)
+        _timed("wiki-index:" + lang, utils.get_local_index, lang)
+    if spacy_models:
+        import pos
+
+        for lang in pos.SPACY_MODELS:
+            _timed("spacy:" + pos.SPACY_MODELS[lang], pos.load_model, lang)
+
+
+def start(spacy_models=None):
+    """Start the warm-up thread once per process.
+
+    Args:
+        spacy_models (bool): If True, also load the spaCy models. Defaults to
+            the TES_WARM_SPACY environment variable.
+
+    Returns:
+        threading.Thread: the warm-up thread.
+    """
+    global _thread
+    if spacy_models is None:
+        spacy_models = os.getenv("TES_WARM_SPACY", "") == "1"
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(
+                target=warm_up,
+                args=(spacy_models,),
+                name="tes-warmup",
+                daemon=True,
+            )
+            _thread.start()
+    return _thread
+
+
+def report():
+    """Format the recorded import and warm-up times.
+
+    Returns:
+        str: one line per module/resource, slowest first.
+    """
+    lines = []
+    for title, times in (("import", import_times), ("warm-up", warmup_times)):
+        for name, seconds in sorted(times.items(), key=lambda x: -x[1]):
+            lines.append("{0:8} {1:40} {2:8.1f} ms".format(title, name, seconds * 1000))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    warm_up(spacy_models=os.getenv("TES_WARM_SPACY", "") == "1")
+    print(report())
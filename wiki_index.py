@@ -0,0 +1,329 @@
+"""Local, memory-mapped Wikipedia/Wikidata entity index.
+
+The index answers the lookups ``get_summary_link`` and ``convert_schema``
+otherwise send to Wikipedia: the two-sentence description of a title, its
+English/Italian langlinks and its Wikidata id, by title, Wikidata id or
+Google Knowledge Graph mid. One index file is built per Wikipedia language:
+
+    python wiki_index.py --lang en --out wiki-en.idx \\
+        --abstracts enwiki-latest-abstract.xml.gz \\
+        --wikidata wikidata-subset.json.gz
+
+``--abstracts`` is a Wikipedia abstracts dump, ``--wikidata`` a Wikidata JSON
+dump (or any subset of it, one entity per line). Either may be omitted.
+
+The file is opened with ``mmap`` read-only, so every worker process shares the
+same pages through the OS page cache. Layout, all integers little-endian
+uint64:
+
+    header   magic, record count, then (offset, count) for each index
+    records  UTF-8 fields joined by RECORD_SEP
+    keys     UTF-8 keys of each index
+    indexes  per index, entries of (key offset, key length, record offset,
+             record length) sorted by key bytes, looked up by binary search
+"""
+import argparse
+import array
+import bz2
+import collections
+import gzip
+import json
+import mmap
+import re
+import struct
+import sys
+import unidecode
+
+
+MAGIC = b"TESWIKI1"
+HEADER = struct.Struct("<8s7Q")
+ENTRY_SIZE = 4
+RECORD_SEP = "\x1f"
+INDEXES = ("title", "wikidata", "mid")
+
+WikiRecord = collections.namedtuple(
+    "WikiRecord", ["title", "summary", "wikidata_id", "en_title", "it_title"]
+)
+
+
+def normalize_title(title):
+    """Normalize a title the way Wikipedia does (spaces, first letter).
+
+    Args:
+        title (str): the title, with spaces or underscores.
+
+    Returns:
+        str: the normalized title.
+    """
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def clean_summary(summary):
+    """Keep the first two sentences of a summary, cleaned like get_summary_link.
+
+    Args:
+        summary (str): the article summary or abstract.
+
+    Returns:
+        str: the cleaned summary.
+    """
+    summary = ". ".join(summary.split(".")[:2])
+    summary = summary.replace("\n", " ").replace(",", " ").replace("  ", " ")
+    return unidecode.unidecode(summary)
+
+
+def page_url(lang, title):
+    """Build the URL of a Wikipedia page.
+
+    Args:
+        lang (str): the Wikipedia language code.
+        title (str): the page title.
+
+    Returns:
+        str: the page URL, or "" if title is empty.
+    """
+    if not title:
+        return ""
+    return "https://{0}.wikipedia.org/wiki/{1}".format(lang, title.replace(" ", "_"))
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_abstracts(path):
+    """Stream (title, summary) pairs from a Wikipedia abstracts dump.
+
+    Args:
+        path (str): the abstracts XML dump, optionally gz/bz2 compressed.
+
+    Yields:
+        tuple: the normalized title and the cleaned summary.
+    """
+    from xml.etree.ElementTree import iterparse
+
+    with _open(path) as f:
+        title = None
+        abstract = ""
+        for event, elem in iterparse(f, events=("end",)):
+            if elem.tag == "title":
+                title = (elem.text or "").split(": ", 1)[-1]
+            elif elem.tag == "abstract":
+                abstract = elem.text or ""
+            elif elem.tag == "doc":
+                if title:
+                    yield normalize_title(title), clean_summary(abstract)
+                title = None
+                abstract = ""
+                elem.clear()
+
+
+def read_wikidata(path, lang):
+    """Stream entities with a sitelink to lang from a Wikidata JSON dump.
+
+    Args:
+        path (str): the JSON dump, optionally gz/bz2 compressed.
+        lang (str): the Wikipedia language of the index.
+
+    Yields:
+        tuple: the title, Wikidata id, en title, it title and KG mids.
+    """
+    with _open(path) as f:
+        for line in f:
+            line = line.strip().rstrip(b",")
+            if not line.startswith(b"{"):
+                continue
+            entity = json.loads(line)
+            sitelinks = entity.get("sitelinks", {})
+            title = sitelinks.get(lang + "wiki", {}).get("title")
+            if not title:
+                continue
+            mids = []
+            for prop in ("P646", "P2671"):
+                for claim in entity.get("claims", {}).get(prop, []):
+                    value = claim.get("mainsnak", {}).get("datavalue", {}).get("value")
+                    if isinstance(value, str):
+                        mids.append(value)
+            yield (
+                normalize_title(title),
+                entity["id"],
+                sitelinks.get("enwiki", {}).get("title", ""),
+                sitelinks.get("itwiki", {}).get("title", ""),
+                mids,
+            )
+
+
+def build(out_path, lang, abstracts=None, wikidata=None):
+    """Build an index file from the dumps.
+
+    Args:
+        out_path (str): the index file to write.
+        lang (str): the Wikipedia language of the dumps.
+        abstracts (str): the Wikipedia abstracts dump, or None.
+        wikidata (str): the Wikidata JSON dump, or None.
+
+    Returns:
+        int: the number of records written.
+    """
+    records = {}
+    mids = {}
+    if abstracts:
+        for title, summary in read_abstracts(abstracts):
+            records[title] = [title, summary, "", "", ""]
+    if wikidata:
+        for title, qid, en_title, it_title, entity_mids in read_wikidata(wikidata, lang):
+            record = records.setdefault(title, [title, "", "", "", ""])
+            record[2:] = [qid, en_title, it_title]
+            for mid in entity_mids:
+                mids[mid] = title
+
+    with open(out_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        locations = {}
+        for title, record in records.items():
+            data = RECORD_SEP.join(record).encode("utf-8")
+            locations[title] = (f.tell(), len(data))
+            f.write(data)
+
+        keys = {
+            "title": [(title, title) for title in records],
+            "wikidata": [(r[2], title) for title, r in records.items() if r[2]],
+            "mid": list(mids.items()),
+        }
+        sections = []
+        for name in INDEXES:
+            entries = []
+            for key, title in keys[name]:
+                data = key.encode("utf-8")
+                entries.append((data, f.tell()) + locations[title])
+                f.write(data)
+            entries.sort(key=lambda x: x[0])
+            sections.append(entries)
+
+        f.write(b"\0" * (-f.tell() % 8))
+        header = [MAGIC, len(records)]
+        for entries in sections:
+            values = array.array("Q")
+            for data, key_offset, record_offset, record_length in entries:
+                values.extend((key_offset, len(data), record_offset, record_length))
+            if sys.byteorder != "little":
+                values.byteswap()
+            header.extend((f.tell(), len(entries)))
+            values.tofile(f)
+        f.seek(0)
+        f.write(HEADER.pack(*header))
+    return len(records)
+
+
+class WikiIndex:
+    def __init__(self, path):
+        """ Opens an index file read-only with mmap
+
+        Args:
+            path (str): The index file built by build()
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mm, 0)
+        if header[0] != MAGIC:
+            raise ValueError("{0} is not a wiki index".format(path))
+        self.size = header[1]
+        self._view = memoryview(self._mm)
+        self._indexes = {}
+        for i, name in enumerate(INDEXES):
+            offset, count = header[2 + 2 * i], header[3 + 2 * i]
+            entries = self._view[offset:offset + count * ENTRY_SIZE * 8].cast("Q")
+            if sys.byteorder != "little":
+                # The entries are little-endian: big-endian hosts search a
+                # swapped copy instead of the shared pages.
+                swapped = array.array("Q", entries)
+                swapped.byteswap()
+                entries.release()
+                entries = swapped
+            self._indexes[name] = entries
+
+    def _find(self, name, key):
+        entries = self._indexes[name]
+        key = key.encode("utf-8")
+        lo, hi = 0, len(entries) // ENTRY_SIZE
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = entries[mid * ENTRY_SIZE]
+            current = self._mm[start:start + entries[mid * ENTRY_SIZE + 1]]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                offset = entries[mid * ENTRY_SIZE + 2]
+                length = entries[mid * ENTRY_SIZE + 3]
+                fields = self._mm[offset:offset + length].decode("utf-8").split(RECORD_SEP)
+                return WikiRecord(*fields)
+        return None
+
+    def lookup_title(self, title):
+        """ Looks up a page by title
+
+        Args:
+            title (str): The page title
+
+        Returns:
+            record (WikiRecord): The page, or None
+        """
+        return self._find("title", normalize_title(title))
+
+    def lookup_wikidata(self, wikidata_id):
+        """ Looks up a page by Wikidata id
+
+        Args:
+            wikidata_id (str): The Wikidata id (Q42)
+
+        Returns:
+            record (WikiRecord): The page, or None
+        """
+        return self._find("wikidata", wikidata_id)
+
+    def lookup_mid(self, mid):
+        """ Looks up a page by Google Knowledge Graph / Freebase mid
+
+        Args:
+            mid (str): The mid (/m/0d6lp), or a kgmid search URL
+
+        Returns:
+            record (WikiRecord): The page, or None
+        """
+        mid = re.sub(r"^.*kgmid=", "", mid)
+        return self._find("mid", mid)
+
+    def close(self):
+        """ Releases the memory map """
+        for name in list(self._indexes):
+            entries = self._indexes.pop(name)
+            if isinstance(entries, memoryview):
+                entries.release()
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build a local Wikipedia/Wikidata entity index.")
+    arg_parser.add_argument("--lang", required=True, help="Wikipedia language of the dumps (en, it)")
+    arg_parser.add_argument("--out", required=True, help="index file to write")
+    arg_parser.add_argument("--abstracts", help="Wikipedia abstracts XML dump")
+    arg_parser.add_argument("--wikidata", help="Wikidata JSON dump or subset")
+    args = arg_parser.parse_args(argv)
+    if not args.abstracts and not args.wikidata:
+        arg_parser.error("at least one of --abstracts and --wikidata is required")
+    count = build(args.out, args.lang, args.abstracts, args.wikidata)
+    print("Wrote {0} records to {1}".format(count, args.out))
+
+
+if __name__ == "__main__":
+    main()